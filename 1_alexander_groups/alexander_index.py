@@ -0,0 +1,129 @@
+"""
+@created: 2026-10-18
+
+@goal: A read-only index of the distinction list, such that a knot from Burton's lists
+        can be matched against the low crossing groups by a single hash probe
+        (instead of parsing and comparing every row of the distinction list).
+
+The index is built once by the main process, pickled to disk and opened (once per worker
+process) by the workers.
+"""
+
+import ast
+import pickle
+import re
+
+
+INDEX_FILE_NAME = "distinction_index.pickle"
+
+# criterion (b): the sum of the crossing numbers has to be at most 25.
+MAX_CROSSING_SUM = 25
+
+# Indices that have already been opened by this process (path -> index)
+_opened_indices = {}
+
+
+def canonical_poly(poly_dict):
+    """ Turns an Alexander polynomial given as {exponent: coefficient} into its canonical,
+    hashable form: the tuple of coefficients (c_0, .., c_d) from the lowest to the highest degree.
+
+    The polynomial is only defined up to units +-t^k, hence the lowest degree is shifted to 0,
+    the sign is chosen such that c_0 > 0, and of (c_0, .., c_d) and (c_d, .., c_0) (t <-> t^-1)
+    the smaller one is taken. So two polynomials agree up to units iff their keys do.
+    """
+    terms = {int(e): int(c) for e, c in poly_dict.items() if c != 0}
+    if len(terms) == 0:
+        return ()
+    low, high = min(terms), max(terms)
+    coefficients = [terms.get(e, 0) for e in range(low, high + 1)]
+
+    candidates = []
+    for coeffs in (coefficients, coefficients[::-1]):
+        if coeffs[0] < 0:
+            coeffs = [-c for c in coeffs]
+        candidates.append(tuple(coeffs))
+    return min(candidates)
+
+
+def multiply_polys(key0, key1):
+    """ The canonical form of the product of two polynomials given in canonical form.
+    (The Alexander polynomial of a connected sum is the product of the ones of the summands.)
+    """
+    product = [0] * (len(key0) + len(key1) - 1)
+    for i, c0 in enumerate(key0):
+        for j, c1 in enumerate(key1):
+            product[i + j] += c0 * c1
+    return canonical_poly(dict(enumerate(product)))
+
+
+def poly_to_str(key):
+    """ The canonical form as written to the csv files, e.g. (2, -5, 2) -> "2,-5,2"."""
+    return ",".join(str(c) for c in key)
+
+def poly_from_str(poly_str):
+    """ Reads a polynomial from a csv file into its canonical form. Accepts the canonical
+    string "2,-5,2" as well as the dict strings "{0: 2, 1: -5, 2: 2}" of the older files.
+    """
+    poly_str = poly_str.strip()
+    if poly_str.startswith("{"):
+        return canonical_poly(ast.literal_eval(poly_str))
+    if poly_str == "":
+        return ()
+    return tuple(int(c) for c in poly_str.split(","))
+
+def poly_to_dict(key):
+    """ The canonical form as {exponent: coefficient}."""
+    return {e: c for e, c in enumerate(key) if c != 0}
+
+
+def build_alexander_index(knots):
+    """
+    knots: iterable of (name, crossings, canonical_poly), e.g. ("6_1", 6, (2, -5, 2))
+
+    Returns {canonical_poly: ((crossings, name), ...)}, where each bucket is sorted by crossings.
+    """
+    index = {}
+    for name, crossings, key in knots:
+        index.setdefault(key, []).append((int(crossings), name))
+
+    return {key: tuple(sorted(bucket)) for key, bucket in index.items()}
+
+
+def save_alexander_index(index, path):
+    with open(path, "wb") as file:
+        pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_alexander_index(path):
+    """ Loads the index from disk. Every process reads the file at most once.
+    """
+    if path not in _opened_indices:
+        with open(path, "rb") as file:
+            _opened_indices[path] = pickle.load(file)
+    return _opened_indices[path]
+
+
+def match_in_index(index, poly_dict, crossings):
+    """ Returns the name of the low crossing knot with the same Alexander polynomial,
+    such that the crossing numbers sum up to at most MAX_CROSSING_SUM. (None if there is none.)
+    """
+    bucket = index.get(canonical_poly(poly_dict))
+    if bucket is None:
+        return None
+
+    k_crossings, k_name = bucket[0]
+    if k_crossings > MAX_CROSSING_SUM - crossings:
+        return None
+    return k_name
+
+
+def crossings_from_name(name):
+    """ The crossing number of a knot given by its name: "6_1" (Rolfsen table), "K11n34" (Hoste-Thistlethwaite 
+    table) or a connected sum of those, e.g. "3_1_plus_K11n34" -> 14.
+    """
+    crossings = 0
+    for summand in name.split("_plus_"):
+        match = re.fullmatch(r"(\d+)_(\d+)|K(\d+)[an](\d+)", summand)
+        assert match is not None, "Unknown knot name {}.".format(summand)
+        crossings += int(match.group(1) or match.group(3))
+    return crossings
@@ -0,0 +1,512 @@
+"""
+@created: 2026-10-18
+
+@goal: Cheap invariants of a knot, computed straight from its DT code (without building a snappy.Link).
+
+We use this as a prefilter: Only if the fingerprint of a knot coincides with the fingerprint of one of
+the low crossing knots, the Alexander polynomial is computed exactly with snappy.
+
+Approach:
+    1) From the DT code, determine the Gauss code with over/under information and the signs of the
+       crossings (by the planarity of the diagram, see crossing_orientations).
+    2) Build the Alexander matrix (Fox calculus on the Wirtinger presentation), delete one row
+       and one column, and compute the determinant modulo a prime p at t = zeta, where zeta is an m-th
+       root of unity mod p. This is Alexander_poly(zeta) up to a unit +-zeta^k. (As for the exact
+       polynomials below, the determinants of a whole batch of knots are computed at once with numpy.)
+    3) The fingerprint consists of the smallest representative of the orbit of this value
+       under multiplication by the units +-zeta^k, for a few (p, m).
+
+Knots with the same Alexander polynomial have the same fingerprint (but not necessarily vice versa).
+
+The same matrices also give the exact Alexander polynomial (see alexander_polynomials): For a batch of
+knots with the same number of crossings, the determinants are evaluated with numpy at enough points
+modulo a few primes, and the polynomial is recovered by interpolation and the Chinese remainder theorem.
+"""
+
+import pickle
+
+import numpy as np
+
+
+FINGERPRINTS_FILE_NAME = "distinction_fingerprints.pickle"
+
+# (p, m): evaluate at an m-th root of unity modulo the prime p. (m has to divide p-1.)
+FINGERPRINT_POINTS = [(2147483647, 2), (2147483647, 3), (2147483647, 7)]
+
+# Number of knots whose fingerprints are computed at the same time.
+FINGERPRINT_BATCH_SIZE = 1000
+
+
+def _root_of_unity(p, m):
+    """ Returns an element of order m in (Z/p)^*, where m is a prime dividing p-1."""
+    assert((p - 1) % m == 0)
+    for x in range(2, p):
+        zeta = pow(x, (p - 1) // m, p)
+        if zeta != 1:
+            return zeta
+
+_ROOTS_OF_UNITY = [(p, m, _root_of_unity(p, m)) for p, m in FINGERPRINT_POINTS]
+
+
+#############################
+# DT codes
+#
+
+# letter -> even number, e.g. "c" -> 6, "C" -> -6
+_LETTER_VALUES = dict([(chr(ord("a") + i), 2 * (i + 1)) for i in range(26)] + [(chr(ord("A") + i), -2 * (i + 1)) for i in range(26)])
+
+def evens_from_alpha(alpha_dt):
+    """ Alphabetical DT code as in Burton's lists (e.g. "fcnjlpHKAmGdeobI") to the list of even numbers
+    (e.g. [12, 6, ...]), where a capital letter indicates a negative number.
+    """
+    try:
+        evens = [_LETTER_VALUES[letter] for letter in alpha_dt]
+    except KeyError as error:
+        raise ValueError("Invalid letter {} in the DT code {}.".format(error.args[0], alpha_dt))
+    check_evens(evens)
+    return evens
+
+def evens_from_snappy_alpha(alpha_dt):
+    """ Alphabetical DT code in the format used by snappy, i.e. with the header
+    <num crossings><num components><length of components>, e.g. "tatbdegahjckmfnpirlsotq".
+    Only knots (one component) are supported.
+    """
+    if len(alpha_dt) < 3 or alpha_dt[1] != "a":
+        raise ValueError("The DT code {} is not the code of a knot.".format(alpha_dt))
+    evens = evens_from_alpha(alpha_dt[3:])
+    if len(evens) != ord(alpha_dt[0]) - ord("a") + 1:
+        raise ValueError("The DT code {} does not have the number of crossings of its header.".format(alpha_dt))
+    return evens
+
+def check_evens(evens):
+    """ Raises a ValueError, unless the absolute values of the evens are exactly 2, 4, .., 2n 
+    (n = number of crossings), i.e. unless each even position is paired with exactly one odd position.
+    """
+    if sorted(abs(e) for e in evens) != list(range(2, 2 * len(evens) + 1, 2)):
+        raise ValueError("The DT code {} is not a permutation of the even numbers 2,..,{}.".format(evens, 2 * len(evens)))
+
+
+def crossing_orientations(evens):
+    """
+    For the crossing i (at the positions 2i+1 and |evens[i]|, with 1 <= position <= 2n) let p < q be
+    its two positions. Returns the list of eps[i] = +1 if the curve crosses at position q the
+    strand through position p from the right to the left, and -1 else. (Up to a common sign.)
+
+    This is determined by the planarity of the curve: The loop A = [p,q] and the rest B of the curve
+    only meet (transversally) at the crossings interlaced with i. Walking along B, one changes the side
+    of A at each of those, and walking along A the sides of A change at each self-crossing of A.
+    Hence the directions, in which B crosses A, can be read off from the parity of these counts.
+    """
+    n = len(evens)
+    size = 2 * n
+
+    partner = [0] * (size + 1)
+    crossing = [0] * (size + 1)
+    for i, e in enumerate(evens):
+        odd = 2 * i + 1
+        partner[odd] = abs(e)
+        partner[abs(e)] = odd
+        crossing[odd] = crossing[abs(e)] = i
+
+    eps = [0] * n
+    for start in range(n):
+        if eps[start] != 0:
+            continue
+        # (For composite diagrams the interlacement graph is disconnected. Each component may then
+        #  be chosen independently, this corresponds to mirroring a summand.)
+        eps[start] = 1
+        stack = [start]
+        while stack:
+            c = stack.pop()
+            p, q = sorted((2 * c + 1, abs(evens[c])))
+
+            # count along B (starting at q) the crossings with A, before each position.
+            crossings_of_B = {}
+            count = 0
+            for z in list(range(q + 1, size + 1)) + list(range(1, p)):
+                crossings_of_B[z] = count
+                if p < partner[z] < q:
+                    count += 1
+
+            # walk along A and count the self-crossings of A.
+            self_crossings = 0
+            for j in range(p + 1, q):
+                y = partner[j]
+                if p < y < q:
+                    self_crossings += 1
+                    continue
+
+                phi = -eps[c] if (self_crossings + crossings_of_B[y]) % 2 == 0 else eps[c]
+                d = crossing[j]
+                d_eps = phi if j < y else -phi
+
+                if eps[d] == 0:
+                    eps[d] = d_eps
+                    stack.append(d)
+                elif eps[d] != d_eps:
+                    raise ValueError("The DT code {} is not realizable.".format(evens))
+    return eps
+
+
+def alexander_matrix_entries(evens):
+    """
+    Returns for each crossing (over_arc, incoming_under_arc, outgoing_under_arc, sign), where the
+    row of the Alexander matrix is
+            (1 - t) at over_arc,  t at incoming_under_arc,  -1 at outgoing_under_arc   (sign +1)
+            (1 - t) at over_arc, -1 at incoming_under_arc,   t at outgoing_under_arc   (sign -1).
+    The arcs are numbered 0,..,n-1.
+
+    Raises a ValueError if the DT code is malformed (see check_evens) or not realizable.
+
+    Convention: A negative entry in the DT code means that the strand is over at the even position.
+    (The mirror has the same Alexander polynomial, so the convention does not matter.)
+    """
+    check_evens(evens)
+    n = len(evens)
+    size = 2 * n
+
+    # over[pos] for each position 1,..,2n and the crossing at each position.
+    over = [False] * (size + 1)
+    crossing = [0] * (size + 1)
+    for i, e in enumerate(evens):
+        odd = 2 * i + 1
+        over[abs(e)] = e < 0
+        over[odd] = not e < 0
+        crossing[odd] = crossing[abs(e)] = i
+
+    eps = crossing_orientations(evens)
+
+    over_arc = [0] * n
+    in_arc = [0] * n
+    out_arc = [0] * n
+    arc = 0
+    for pos in range(1, size + 1):
+        c = crossing[pos]
+        if over[pos]:
+            over_arc[c] = arc
+        else:
+            in_arc[c] = arc
+            arc = (arc + 1) % n
+            out_arc[c] = arc
+
+    entries = []
+    for i, e in enumerate(evens):
+        first_over = over[min(2 * i + 1, abs(e))]
+        sign = eps[i] if first_over else -eps[i]
+        entries.append((over_arc[i], in_arc[i], out_arc[i], sign))
+    return entries
+
+
+#############################
+# Evaluation modulo p
+#
+
+def _orbit_representatives(values, p, m, zeta):
+    """ The smallest element of {+-zeta^k * value mod p}, elementwise for an int64 array of values."""
+    representatives = values.copy()
+    x = values
+    for _ in range(m):
+        x = x * zeta % p
+        representatives = np.minimum(representatives, np.minimum(x, (p - x) % p))
+    return representatives
+
+def _fingerprints_same_size(entries):
+    """ The fingerprints of the knots with the entries (array of shape (B, n, 4), n >= 2), see 
+    alexander_matrix_entries. All the matrices of the batch are eliminated at once (see _determinants_mod_p).
+    """
+    A0, A1 = _reduced_alexander_matrices(entries)
+    B = len(entries)
+
+    # (the points with the same prime are eliminated together)
+    columns = {}
+    for p in dict.fromkeys(p for p, _, _ in _ROOTS_OF_UNITY):
+        points = [(i, m, zeta) for i, (q, m, zeta) in enumerate(_ROOTS_OF_UNITY) if q == p]
+        matrices = np.concatenate([(A0 + zeta * A1) % p for _, _, zeta in points])
+        values = _determinants_mod_p(matrices, p).reshape(len(points), B)
+        for (i, m, zeta), point_values in zip(points, values):
+            columns[i] = _orbit_representatives(point_values, p, m, zeta).tolist()
+    return list(zip(*[columns[i] for i in range(len(_ROOTS_OF_UNITY))]))
+
+def fingerprints_from_evens(evens_list, batch_size=FINGERPRINT_BATCH_SIZE):
+    """ The fingerprints of the knots given by the DT codes (as lists of evens), computed in batches
+    of knots with the same number of crossings. The fingerprint of a DT code that is malformed or 
+    not realizable is None.
+    """
+    fingerprints = [None] * len(evens_list)
+
+    by_size = {}
+    for i, evens in enumerate(evens_list):
+        try:
+            entries = alexander_matrix_entries(evens)
+        except ValueError:
+            continue
+        if len(evens) < 2:
+            # (The matrix after deleting a row and column is empty, Alexander polynomial = 1.)
+            fingerprints[i] = fingerprint_of_polynomial({0: 1})
+            continue
+        by_size.setdefault(len(evens), []).append((i, entries))
+
+    for n, knots in by_size.items():
+        for start in range(0, len(knots), batch_size):
+            batch = knots[start:start + batch_size]
+            entries = np.array([entries for _, entries in batch], dtype=np.int64)
+            for (i, _), fingerprint in zip(batch, _fingerprints_same_size(entries)):
+                fingerprints[i] = fingerprint
+    return fingerprints
+
+def fingerprint_from_evens(evens):
+    """ The fingerprint of the knot given by the DT code (as list of evens)."""
+    fingerprint = fingerprints_from_evens([evens])[0]
+    if fingerprint is None:
+        raise ValueError("The DT code {} is malformed or not realizable.".format(evens))
+    return fingerprint
+
+def fingerprint_from_alpha(alpha_dt):
+    """ The fingerprint of the knot given by an alphabetical DT code as in Burton's lists."""
+    return fingerprint_from_evens(evens_from_alpha(alpha_dt))
+
+def fingerprint_of_polynomial(poly_dict):
+    """ The fingerprint of the Alexander polynomial, given as {exponent: coefficient}."""
+    fingerprint = []
+    for p, m, zeta in _ROOTS_OF_UNITY:
+        value = sum(int(c) * pow(zeta, int(e) % m, p) for e, c in poly_dict.items()) % p
+        fingerprint.append(int(_orbit_representatives(np.array([value], dtype=np.int64), p, m, zeta)[0]))
+    return tuple(fingerprint)
+
+
+#############################
+# Exact Alexander polynomials (batches with numpy)
+#
+
+# Primes for the Chinese remainder theorem. (Below 2^31, so that products of two residues fit into int64.)
+EXACT_PRIMES = [2147483647, 2147483629, 2147483587, 2147483579]
+
+# Number of knots whose matrices are eliminated at the same time.
+EXACT_BATCH_SIZE = 1000
+
+def _pow_mod(base, exponent, p):
+    """ base^exponent mod p, elementwise for an int64 array."""
+    result = np.ones_like(base)
+    base = base % p
+    while exponent > 0:
+        if exponent & 1:
+            result = result * base % p
+        base = base * base % p
+        exponent >>= 1
+    return result
+
+def _determinants_mod_p(matrices, p):
+    """ The determinants modulo p of the stacked square matrices (int64 array of shape (K, m, m),
+    entries in 0,..,p-1) by Gaussian elimination on all of them at once. (The matrices are changed.)
+    """
+    K, m, _ = matrices.shape
+    det = np.ones(K, dtype=np.int64)
+    rows = np.arange(K)
+    for col in range(m):
+        # pivot: the first row (from col on) with a non-zero entry in this column
+        pivot = col + np.argmax(matrices[:, col:, col] != 0, axis=1)
+        swap = pivot != col
+        if swap.any():
+            pivot_rows = matrices[rows, pivot].copy()
+            matrices[rows, pivot] = matrices[rows, col]
+            matrices[rows, col] = pivot_rows
+            det = np.where(swap, (p - det) % p, det)
+
+        pivot_values = matrices[:, col, col]
+        det = det * pivot_values % p  # (becomes 0 if there is no pivot)
+
+        if col + 1 < m:
+            factors = matrices[:, col + 1:, col] * _pow_mod(pivot_values, p - 2, p)[:, None] % p
+            update = factors[:, :, None] * matrices[:, col, None, col + 1:]
+            update %= p
+            remaining = matrices[:, col + 1:, col + 1:]
+            remaining -= update
+            remaining %= p
+    return det
+
+def _reduced_alexander_matrices(entries):
+    """ For the entries (array of shape (B, n, 4), see alexander_matrix_entries) returns the 
+    reduced Alexander matrices A = A0 + t * A1 (last row and column removed) as two int64 arrays
+    of shape (B, n-1, n-1).
+    """
+    B, n, _ = entries.shape
+    m = n - 1
+    A0 = np.zeros((B, m + 1, m + 1), dtype=np.int64)
+    A1 = np.zeros((B, m + 1, m + 1), dtype=np.int64)
+
+    knots = np.repeat(np.arange(B), n)
+    rows = np.tile(np.arange(n), B)
+    over_arc, in_arc, out_arc, sign = [entries[:, :, i].reshape(-1) for i in range(4)]
+    positive = sign == 1
+    negative = ~positive
+
+    # (1 - t) at the over arc
+    np.add.at(A0, (knots, rows, over_arc), 1)
+    np.add.at(A1, (knots, rows, over_arc), -1)
+    # sign +1: t at the incoming, -1 at the outgoing under arc. sign -1: -1 resp. t.
+    np.add.at(A1, (knots[positive], rows[positive], in_arc[positive]), 1)
+    np.add.at(A0, (knots[positive], rows[positive], out_arc[positive]), -1)
+    np.add.at(A0, (knots[negative], rows[negative], in_arc[negative]), -1)
+    np.add.at(A1, (knots[negative], rows[negative], out_arc[negative]), 1)
+
+    return A0[:, :m, :m], A1[:, :m, :m]
+
+def _interpolation_matrix(points, p):
+    """ The inverse of the Vandermonde matrix (x^j) of the points modulo p (as list of lists)."""
+    size = len(points)
+    # solve V * X = I by Gauss-Jordan elimination modulo p
+    matrix = [[pow(x, j, p) for j in range(size)] + [1 if i == k else 0 for k in range(size)] for i, x in enumerate(points)]
+    for col in range(size):
+        pivot = next(row for row in range(col, size) if matrix[row][col] != 0)
+        matrix[col], matrix[pivot] = matrix[pivot], matrix[col]
+        inverse = pow(matrix[col][col], p - 2, p)
+        matrix[col] = [x * inverse % p for x in matrix[col]]
+        for row in range(size):
+            if row != col and matrix[row][col] != 0:
+                factor = matrix[row][col]
+                matrix[row] = [(x - factor * y) % p for x, y in zip(matrix[row], matrix[col])]
+    # V^{-1} maps the values at the points to the coefficients.
+    return [row[size:] for row in matrix]
+
+def _normalize(coefficients):
+    """ Coefficients (lowest degree first) -> {exponent: coefficient} as returned by snappy:
+    lowest degree 0 and positive leading coefficient.
+    """
+    low = 0
+    while low < len(coefficients) and coefficients[low] == 0:
+        low += 1
+    high = len(coefficients) - 1
+    while high >= low and coefficients[high] == 0:
+        high -= 1
+    if high < low:
+        return {}
+    sign = 1 if coefficients[high] > 0 else -1
+    return {e - low: sign * coefficients[e] for e in range(low, high + 1) if coefficients[e] != 0}
+
+def _alexander_polynomials_same_size(entries):
+    """ The Alexander polynomials of the knots with the entries (array of shape (B, n, 4), n >= 2), see 
+    alexander_matrix_entries.
+    """
+    B, n, _ = entries.shape
+    m = n - 1
+    A0, A1 = _reduced_alexander_matrices(entries)
+
+    # The determinant D(t) has degree <= m. On |t| = 1, each row of the matrix has euclidean norm at most
+    # sqrt(6), hence |D(t)| <= 6^(m/2) (Hadamard), and so are the absolute values of its coefficients.
+    # The primes are chosen such that their product is > 2 * 6^(m/2).
+    points = list(range(1, m + 2))
+    primes = []
+    modulus = 1
+    for p in EXACT_PRIMES:
+        if modulus**2 > 4 * 6**m:
+            break
+        primes.append(p)
+        modulus *= p
+    assert(modulus**2 > 4 * 6**m)
+
+    # residues[prime index][knot][coefficient]
+    residues = []
+    for p in primes:
+        matrices = np.concatenate([(A0 + x * A1) % p for x in points])  # (points * B, m, m)
+        values = _determinants_mod_p(matrices, p).reshape(len(points), B)
+
+        interpolation = _interpolation_matrix(points, p)
+        coefficients = np.zeros((B, len(points)), dtype=np.int64)
+        for j in range(len(points)):
+            for k in range(len(points)):
+                coefficients[:, j] = (coefficients[:, j] + interpolation[j][k] * values[k] % p) % p
+        residues.append(coefficients.tolist())
+
+    polynomials = []
+    for knot in range(B):
+        coefficients = []
+        for j in range(len(points)):
+            # Chinese remainder theorem, then the representative in (-modulus/2, modulus/2)
+            value, value_modulus = 0, 1
+            for p, residue in zip(primes, residues):
+                r = residue[knot][j]
+                value += value_modulus * ((r - value) * pow(value_modulus, -1, p) % p)
+                value_modulus *= p
+            if value > modulus // 2:
+                value -= modulus
+            coefficients.append(value)
+        polynomials.append(_normalize(coefficients))
+    return polynomials
+
+def alexander_polynomials(evens_list, batch_size=EXACT_BATCH_SIZE):
+    """ The exact Alexander polynomials of the knots given by DT codes (as lists of evens), each as 
+    {exponent: coefficient}, normalized as snappy.Link(..).alexander_polynomial().dict(), i.e. with lowest 
+    degree 0 and positive leading coefficient.
+
+    The knots are grouped by their number of crossings and computed in batches of <batch_size>.
+    The polynomial of a DT code that is malformed or not realizable is None.
+    """
+    polynomials = [None] * len(evens_list)
+
+    by_size = {}
+    for i, evens in enumerate(evens_list):
+        try:
+            entries = alexander_matrix_entries(evens)
+        except ValueError:
+            continue
+        if len(evens) < 2:
+            polynomials[i] = {0: 1}
+            continue
+        by_size.setdefault(len(evens), []).append((i, entries))
+
+    for n, knots in by_size.items():
+        for start in range(0, len(knots), batch_size):
+            batch = knots[start:start + batch_size]
+            entries = np.array([entries for _, entries in batch], dtype=np.int64)
+            for (i, _), polynomial in zip(batch, _alexander_polynomials_same_size(entries)):
+                polynomials[i] = polynomial
+    return polynomials
+
+def alexander_polynomial(evens):
+    """ The exact Alexander polynomial of a single knot (see alexander_polynomials)."""
+    polynomial = alexander_polynomials([evens])[0]
+    if polynomial is None:
+        raise ValueError("The DT code {} is malformed or not realizable.".format(evens))
+    return polynomial
+
+
+def build_fingerprint_table(knots):
+    """
+    knots: iterable of (name, crossings, poly_dict)
+
+    Returns {fingerprint: minimal crossing number of a knot with this fingerprint}
+    """
+    table = {}
+    for name, crossings, poly_dict in knots:
+        fingerprint = fingerprint_of_polynomial(poly_dict)
+        table[fingerprint] = min(int(crossings), table.get(fingerprint, int(crossings)))
+    return table
+
+def save_fingerprint_table(table, path):
+    with open(path, "wb") as file:
+        pickle.dump(table, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+# Tables that have already been opened by this process (path -> table)
+_opened_tables = {}
+
+def load_fingerprint_table(path):
+    """ Loads the table from disk. Every process reads the file at most once.
+    """
+    if path not in _opened_tables:
+        with open(path, "rb") as file:
+            _opened_tables[path] = pickle.load(file)
+    return _opened_tables[path]
+
+def passes_fingerprints(table, evens_list, max_crossing_sum):
+    """ For each of the knots given by the DT codes, whether it can have the same Alexander polynomial
+    as a knot of the table, such that their crossing numbers sum up to at most max_crossing_sum.
+    (None for a DT code that is malformed or not realizable.)
+    """
+    passes = []
+    for evens, fingerprint in zip(evens_list, fingerprints_from_evens(evens_list)):
+        if fingerprint is None:
+            passes.append(None)
+            continue
+        min_crossings = table.get(fingerprint)
+        passes.append(min_crossings is not None and min_crossings <= max_crossing_sum - len(evens))
+    return passes
@@ -0,0 +1,73 @@
+"""
+@created: 2026-10-18
+
+@goal: Append rows to many csv files (e.g. the group files) without reopening a file for every row.
+
+The rows are buffered per file and written in batches. At most <max_open_files> files are kept
+open at the same time, the least recently used one is closed if another one has to be opened.
+"""
+
+from collections import OrderedDict
+import csv
+import io
+
+
+class GroupWriters:
+    """ Use as
+        with GroupWriters(columns) as writers:
+            writers.add(csv_file_path, row)
+    All the rows are written when the with-block is left (or flush is called).
+    """
+
+    def __init__(self, columns, delimiter=",", max_open_files=64, max_buffered_rows=100000):
+        self.columns = columns
+        self.delimiter = delimiter
+        self.max_open_files = max_open_files
+        self.max_buffered_rows = max_buffered_rows
+
+        self._open_files = OrderedDict()  # csv_file_path -> file (least recently used first)
+        self._buffers = {}  # csv_file_path -> [row, ...]
+        self._num_buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, csv_file_path, row):
+        """ Appends the row (dict with the columns as keys) to the file."""
+        self._buffers.setdefault(csv_file_path, []).append(row)
+        self._num_buffered += 1
+        if self._num_buffered >= self.max_buffered_rows:
+            self.flush()
+
+    def _get_file(self, csv_file_path):
+        if csv_file_path in self._open_files:
+            self._open_files.move_to_end(csv_file_path)
+        else:
+            if len(self._open_files) >= self.max_open_files:
+                _, file = self._open_files.popitem(last=False)
+                file.close()
+            self._open_files[csv_file_path] = open(csv_file_path, "a", newline='')
+        return self._open_files[csv_file_path]
+
+    def flush(self):
+        """ Writes all the buffered rows (one write per file)."""
+        for csv_file_path, rows in self._buffers.items():
+            text = io.StringIO()
+            writer = csv.DictWriter(text, fieldnames=self.columns, delimiter=self.delimiter)
+            writer.writerows(rows)
+
+            file = self._get_file(csv_file_path)
+            file.write(text.getvalue())
+            file.flush()
+
+        self._buffers = {}
+        self._num_buffered = 0
+
+    def close(self):
+        self.flush()
+        for file in self._open_files.values():
+            file.close()
+        self._open_files = OrderedDict()
@@ -0,0 +1,234 @@
+"""
+@created: 2026-10-18
+
+@goal: A compact binary columnar copy of a knot list from Burton (name, knot_sig, dt_code), which is
+        created once from the CSV file and then opened with mmap. This allows every stage to access
+        a knot by its row index and to run over the list without parsing the CSV file again.
+
+A store is a directory with the files:
+    meta.json       -> number of rows, the interned name prefixes and whether the rows are sorted by name (in_order)
+    name_ids.bin    -> uint8 per row: index of the name prefix, e.g. "19nh_" (with the width of the number)
+    numbers.bin     -> uint32 per row: the number in the name, e.g. 1633088 for "19nh_001633088"
+    dt_codes.bin    -> the alphabetical DT codes (one byte per crossing), concatenated
+    dt_offsets.bin  -> uint64 per row + 1: the start of the DT code of each row in dt_codes.bin
+    name_index.bin  -> uint64 per row: the rows sorted by (name prefix, number), only if the rows of the
+                        CSV file are not already in this order (see find_row)
+
+(The knot_sig column is not used by any of the stages, hence not stored.)
+"""
+
+from array import array
+import csv
+import json
+import mmap
+import os
+
+import numpy as np
+
+
+STORE_FILES = ["name_ids.bin", "numbers.bin", "dt_codes.bin", "dt_offsets.bin"]
+
+# Number of rows which are buffered before writing during the conversion.
+WRITE_BUFFER_ROWS = 1000000
+
+
+def split_name(name):
+    """ "19nh_001633088" -> ("19nh_", 9, 1633088), a name without trailing digits -> (name, 0, 0)"""
+    digits = len(name)
+    while digits > 0 and name[digits - 1].isdigit():
+        digits -= 1
+    if digits == len(name):
+        return name, 0, 0
+    return name[:digits], len(name) - digits, int(name[digits:])
+
+
+def convert_csv_to_store(csv_path, store_path, columns=["name", "knot_sig", "dt_code"], delimiter=","):
+    """ Reads the CSV file once and writes the columnar store. Returns the number of rows."""
+    name_column = columns.index("name")
+    dt_column = columns.index("dt_code")
+
+    os.makedirs(store_path, exist_ok=True)
+
+    prefixes = {}  # (prefix, width) -> id
+    num_rows = 0
+    dt_offset = 0
+
+    # whether the rows are sorted by (prefix id, number), see find_row
+    in_order = True
+    last_key = None
+
+    name_ids, numbers, dt_offsets = array("B"), array("I"), array("Q", [0])
+    dt_codes = bytearray()
+
+    files = {f: open(os.path.join(store_path, f), "wb") for f in STORE_FILES}
+
+    def write_buffers():
+        name_ids.tofile(files["name_ids.bin"])
+        numbers.tofile(files["numbers.bin"])
+        dt_offsets.tofile(files["dt_offsets.bin"])
+        files["dt_codes.bin"].write(dt_codes)
+        del name_ids[:], numbers[:], dt_offsets[:], dt_codes[:]
+
+    try:
+        with open(csv_path, newline='') as file:
+            reader = csv.reader(file, delimiter=delimiter, skipinitialspace=True)
+            for row in reader:
+                # skip blank lines
+                if len(row) == 0 or all(field.strip() == "" for field in row):
+                    continue
+                # skip first line if it is header
+                if row[name_column] == columns[name_column]:
+                    continue
+
+                prefix, width, number = split_name(row[name_column])
+                if (prefix, width) not in prefixes:
+                    prefixes[(prefix, width)] = len(prefixes)
+                    if len(prefixes) > 256:
+                        raise ValueError("More than 256 distinct name prefixes in {}.".format(csv_path))
+                if number >= 2**32:
+                    raise ValueError("The number of the knot {} is too large.".format(row[name_column]))
+
+                dt_code = row[dt_column].encode("ascii")
+
+                key = (prefixes[(prefix, width)], number)
+                if last_key is not None and key < last_key:
+                    in_order = False
+                last_key = key
+
+                name_ids.append(prefixes[(prefix, width)])
+                numbers.append(number)
+                dt_codes += dt_code
+                dt_offset += len(dt_code)
+                dt_offsets.append(dt_offset)
+
+                num_rows += 1
+                if num_rows % WRITE_BUFFER_ROWS == 0:
+                    write_buffers()
+        write_buffers()
+    finally:
+        for f in files.values():
+            f.close()
+
+    if not in_order:
+        write_name_index(store_path)
+
+    # The meta file is written last, its existence marks a complete store.
+    meta = {"csv_path": csv_path, "num_rows": num_rows, "in_order": in_order,
+            "prefixes": [[prefix, width] for (prefix, width), _ in sorted(prefixes.items(), key=lambda x: x[1])]}
+    with open(os.path.join(store_path, "meta.json"), "w") as file:
+        json.dump(meta, file)
+
+    return num_rows
+
+
+def write_name_index(store_path):
+    """ Writes the rows sorted by (prefix id, number) to name_index.bin."""
+    name_ids = np.fromfile(os.path.join(store_path, "name_ids.bin"), dtype=np.uint8)
+    numbers = np.fromfile(os.path.join(store_path, "numbers.bin"), dtype=np.uint32)
+    np.lexsort((numbers, name_ids)).astype(np.uint64).tofile(os.path.join(store_path, "name_index.bin"))
+
+
+def store_exists(store_path):
+    return os.path.isfile(os.path.join(store_path, "meta.json"))
+
+
+class KnotStore:
+    """ Read-only access to a store (see convert_csv_to_store). Rows are indexed 0,..,len(store)-1
+    in the order of the CSV file (without the header).
+    """
+
+    def __init__(self, store_path):
+        with open(os.path.join(store_path, "meta.json")) as file:
+            meta = json.load(file)
+        self.num_rows = meta["num_rows"]
+        self.prefixes = [(prefix, width) for prefix, width in meta["prefixes"]]
+
+        self._files = []
+        self._maps = []
+        self.name_ids = self._open(store_path, "name_ids.bin", "B")
+        self.numbers = self._open(store_path, "numbers.bin", "I")
+        self.dt_codes = self._open(store_path, "dt_codes.bin", "B")
+        self.dt_offsets = self._open(store_path, "dt_offsets.bin", "Q")
+
+        # (None for a store of an older version, which does not know whether its rows are sorted)
+        self.in_order = meta["in_order"]
+        self.name_index = None
+        if not self.in_order:
+            self.name_index = self._open(store_path, "name_index.bin", "Q")
+
+    def _open(self, store_path, file_name, type_code):
+        file = open(os.path.join(store_path, file_name), "rb")
+        self._files.append(file)
+        if os.fstat(file.fileno()).st_size == 0:
+            # (mmap can not map empty files.)
+            return memoryview(b"").cast(type_code)
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped).cast(type_code)
+
+    def __len__(self):
+        return self.num_rows
+
+    def name(self, row):
+        prefix, width = self.prefixes[self.name_ids[row]]
+        if width == 0:
+            return prefix
+        return prefix + str(self.numbers[row]).zfill(width)
+
+    def dt_code(self, row):
+        """ The alphabetical DT code, as in the CSV file."""
+        return bytes(self.dt_codes[self.dt_offsets[row]:self.dt_offsets[row + 1]]).decode("ascii")
+
+    def rows(self, start=0, stop=None):
+        """ Iterates over (row, name, dt_code) for start <= row < stop."""
+        if stop is None or stop > self.num_rows:
+            stop = self.num_rows
+        for row in range(start, stop):
+            yield row, self.name(row), self.dt_code(row)
+
+    def names(self, start=0, stop=None):
+        """ Iterates over (row, name) for start <= row < stop. (Does not touch the DT codes.)"""
+        if stop is None or stop > self.num_rows:
+            stop = self.num_rows
+        for row in range(start, stop):
+            yield row, self.name(row)
+
+    def find_row(self, name):
+        """ The row of the knot with the given name (None if it does not exist)."""
+        prefix, width, number = split_name(name)
+        if (prefix, width) not in self.prefixes:
+            return None
+        name_id = self.prefixes.index((prefix, width))
+
+        # binary search over the rows sorted by (prefix id, number)
+        def row_at(position):
+            return position if self.name_index is None else self.name_index[position]
+
+        low, high = 0, self.num_rows
+        while low < high:
+            middle = (low + high) // 2
+            row = row_at(middle)
+            if (self.name_ids[row], self.numbers[row]) < (name_id, number):
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.num_rows and (self.name_ids[row_at(low)], self.numbers[row_at(low)]) == (name_id, number):
+            return row_at(low)
+        return None
+
+    def close(self):
+        for view in (self.name_ids, self.numbers, self.dt_codes, self.dt_offsets, self.name_index):
+            if view is not None:
+                view.release()
+        for mapped in self._maps:
+            mapped.close()
+        for file in self._files:
+            file.close()
+
+
+def open_store(csv_path, store_path, columns=["name", "knot_sig", "dt_code"], delimiter=","):
+    """ Opens the store of the knot list, converts the CSV file first if the store does not exist yet."""
+    if not store_exists(store_path):
+        print("Converting {} into the store {}.".format(csv_path, store_path))
+        convert_csv_to_store(csv_path, store_path, columns, delimiter)
+    return KnotStore(store_path)
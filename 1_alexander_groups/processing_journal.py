@@ -0,0 +1,148 @@
+"""
+@created: 2026-10-18
+
+@goal: Book-keeping of the processed knots of a knot list, keyed by the row index in the
+        store of the list (see knot_store.py), instead of the names in .no_group.csv / .with_group.csv.
+
+For each list there are two files:
+    <list>.bitmap   -> one bit per row of the list, set iff the row has been processed.
+    <list>.journal  -> append-only, one fixed-size record (row, crossings, matched_name) per knot
+                        that has a matching low crossing knot.
+
+Both files are only written by a single process (the one collecting the results of the workers),
+batch by batch: first the records of the batch are appended, then the bits are set. If the process
+dies in between, the batch is processed again and its records appear twice in the journal, which
+read_matches takes care of.
+
+The progress of the earlier runs (.no_group.csv / .with_group.csv) can be imported once into a new
+journal (see import_processed_csv in generate_alexander_groups.sage).
+"""
+
+import os
+import struct
+
+
+JOURNAL = ".journal"
+BITMAP = ".bitmap"
+
+# row (uint64), crossings (uint8), matched_name (ASCII, padded with zero bytes)
+# (names of connected sums with many summands are long, e.g. "3_1_plus_3_1_plus_4_1_plus_5_2")
+NAME_SIZE = 119
+RECORD = struct.Struct("<QB{}s".format(NAME_SIZE))
+
+
+def bitmap_size(num_rows):
+    return (num_rows + 7) // 8
+
+
+# number of set bits of each byte
+_POPCOUNT = bytes(bin(i).count("1") for i in range(256))
+
+def count_bits(bitmap):
+    value = int.from_bytes(bitmap, "little")
+    if hasattr(value, "bit_count"):
+        return value.bit_count()
+    # (int.bit_count needs python >= 3.10)
+    return sum(bytes(bitmap).translate(_POPCOUNT))
+
+
+def _read_records(path):
+    if not os.path.isfile(path):
+        return []
+    with open(path, "rb") as file:
+        data = file.read()
+    records = []
+    for offset in range(0, len(data) - len(data) % RECORD.size, RECORD.size):
+        row, crossings, matched_name = RECORD.unpack_from(data, offset)
+        records.append((row, crossings, matched_name.rstrip(b"\0").decode("ascii")))
+    return records
+
+def _pack_record(row, crossings, matched_name):
+    name = matched_name.encode("ascii")
+    # (struct.pack would silently cut off the name)
+    assert len(name) <= NAME_SIZE, "The name {} is longer than {} bytes.".format(matched_name, NAME_SIZE)
+    return RECORD.pack(row, int(crossings), name)
+
+
+class ProcessingJournal:
+    """ The journal and the bitmap of a knot list with <num_rows> rows, opened for appending.
+    """
+
+    def __init__(self, path, num_rows):
+        self.num_rows = num_rows
+        self.bitmap_path = path + BITMAP
+        self.journal_path = path + JOURNAL
+
+        if not os.path.isfile(self.bitmap_path):
+            with open(self.bitmap_path, "wb") as file:
+                file.write(bytes(bitmap_size(num_rows)))
+
+        self._bitmap_file = open(self.bitmap_path, "r+b")
+        self.bitmap = bytearray(self._bitmap_file.read())
+        assert(len(self.bitmap) == bitmap_size(num_rows))
+
+        # drop a record that was only partially written
+        journal_size = os.path.getsize(self.journal_path) if os.path.isfile(self.journal_path) else 0
+        if journal_size % RECORD.size != 0:
+            os.truncate(self.journal_path, journal_size - journal_size % RECORD.size)
+
+        self._journal_file = open(self.journal_path, "ab")
+
+    def is_processed(self, row):
+        return self.bitmap[row >> 3] & (1 << (row & 7)) != 0
+
+    def num_processed(self):
+        return count_bits(self.bitmap)
+
+    def unprocessed_rows(self, start=0, stop=None):
+        """ Iterates over the rows which have not been processed yet. (Skips full bytes at once.)"""
+        if stop is None or stop > self.num_rows:
+            stop = self.num_rows
+        row = start
+        while row < stop:
+            if row & 7 == 0 and self.bitmap[row >> 3] == 0xFF:
+                row += 8
+                continue
+            if not self.is_processed(row):
+                yield row
+            row += 1
+
+    def append(self, matches, rows):
+        """ Appends the records of the matches [(row, crossings, matched_name), ...] and marks
+        the given rows as processed.
+        """
+        if len(matches) > 0:
+            self._journal_file.write(b"".join(_pack_record(row, crossings, matched_name) for row, crossings, matched_name in matches))
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+
+        first, last = None, None
+        for row in rows:
+            self.bitmap[row >> 3] |= 1 << (row & 7)
+            first = row if first is None else min(first, row)
+            last = row if last is None else max(last, row)
+
+        # only write the bytes that have changed (the rows of a batch are consecutive)
+        if first is not None:
+            self._bitmap_file.seek(first >> 3)
+            self._bitmap_file.write(self.bitmap[first >> 3:(last >> 3) + 1])
+            self._bitmap_file.flush()
+
+    def close(self):
+        self._journal_file.close()
+        self._bitmap_file.close()
+
+
+def journal_exists(path):
+    return os.path.isfile(path + BITMAP)
+
+def load_bitmap(path):
+    with open(path + BITMAP, "rb") as file:
+        return file.read()
+
+def read_matches(path):
+    """ Returns the records of the journal [(row, crossings, matched_name), ...], sorted by row,
+    each row at most once.
+    """
+    matches = {match[0]: match for match in _read_records(path + JOURNAL)}
+    return [matches[row] for row in sorted(matches)]
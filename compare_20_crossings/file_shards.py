@@ -0,0 +1,63 @@
+"""
+@created: 2026-10-18
+
+@goal: Divide a knot file (one knot per line) into any number of line-aligned byte ranges,
+        such that each worker can process its range directly from the original file
+        (instead of splitting the file into copies with "split" beforehand).
+
+A shard (start, end) contains exactly the lines which start at a byte offset in [start, end).
+The shards of a file are disjoint and cover every line exactly once.
+"""
+
+import os
+
+
+def _next_line_start(file, offset, size):
+    """ The offset of the first line starting at or after <offset>."""
+    if offset <= 0:
+        return 0
+    if offset >= size:
+        return size
+    # the line starts at offset iff the previous byte is a line break
+    file.seek(offset - 1)
+    file.readline()
+    return min(file.tell(), size)
+
+
+def shard_ranges(path, num_shards):
+    """ Returns the list of <num_shards> byte ranges [(start, end), ...] of the file.
+    (Shards may be empty if the file has fewer lines than shards.)
+    """
+    assert(num_shards >= 1)
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        boundaries = [_next_line_start(file, size * i // num_shards, size) for i in range(num_shards)] + [size]
+    return [(boundaries[i], boundaries[i + 1]) for i in range(num_shards)]
+
+
+def task_ranges(path, task_size):
+    """ Divides the file into line-aligned byte ranges of about <task_size> bytes each.
+    (For the same file and task size, the ranges are always the same.)
+    """
+    size = os.path.getsize(path)
+    return shard_ranges(path, max(1, -(-size // task_size)))
+
+
+def shard_name(path, shard_idx, num_shards):
+    """ A name for the shard (e.g. for the output), like "nonalt_hyp_20.s003of128"."""
+    return "{}.s{:03d}of{:03d}".format(path, shard_idx, num_shards)
+
+
+def read_lines(path, start, end):
+    """ Iterates over (offset, line) for the lines (as bytes, including the line break)
+    starting in [start, end).
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        offset = start
+        while offset < end:
+            line = file.readline()
+            if not line:
+                break
+            yield offset, line
+            offset += len(line)
@@ -0,0 +1,105 @@
+"""
+@created: 2026-10-18
+
+@goal: Checkpoints for long scans over a knot file, such that a restart can seek directly
+        to the last checkpoint instead of reading (and skipping) all the rows before it.
+
+The checkpoints of <file> are stored in <file>.checkpoint, one line "count,offset" per checkpoint:
+the first <count> rows of the file have been processed, and the next row starts at byte <offset>.
+A checkpoint is only written once all the rows before it have been processed (and their results
+written), hence the rows after the last checkpoint are the only ones that are processed again.
+"""
+
+import os
+
+
+CHECKPOINT = ".checkpoint"
+
+# write a checkpoint every CHECKPOINT_INTERVAL rows
+CHECKPOINT_INTERVAL = 100000
+
+
+def checkpoint_path(path):
+    return path + CHECKPOINT
+
+def load_checkpoints(path):
+    """ Returns the list of checkpoints [(count, offset), ...] (empty if there is no file)."""
+    checkpoints = []
+    if path is None or not os.path.isfile(path):
+        return checkpoints
+    with open(path) as file:
+        for line in file:
+            # (a line that was only partially written is ignored)
+            if not line.endswith("\n"):
+                continue
+            count, offset = line.strip().split(",")
+            checkpoints.append((int(count), int(offset)))
+    return checkpoints
+
+def last_checkpoint(path, max_count=None, start_offset=0):
+    """ The checkpoint (count, offset) with the largest count (at most max_count, if specified).
+    Returns (0, start_offset) if there is none.
+    """
+    best = (0, start_offset)
+    for count, offset in load_checkpoints(path):
+        if (max_count is None or count <= max_count) and count > best[0]:
+            best = (count, offset)
+    return best
+
+
+class CheckpointWriter:
+    """ Appends checkpoints to the file, use as
+        with CheckpointWriter(path) as writer:
+            ...
+            writer.append(count, offset)
+    (If path is None, no checkpoints are written.)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        if self.path is None:
+            return self
+
+        # drop a line that was only partially written
+        if os.path.isfile(self.path):
+            with open(self.path, "rb") as file:
+                data = file.read()
+            if not data.endswith(b"\n"):
+                os.truncate(self.path, data.rfind(b"\n") + 1)
+
+        self.file = open(self.path, "a")
+        return self
+
+    def __exit__(self, *args):
+        if self.file is not None:
+            self.file.close()
+
+    def append(self, count, offset):
+        if self.file is None:
+            return
+        self.file.write("{},{}\n".format(count, offset))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+
+#############################
+# Completed tasks
+#
+# For the work-stealing mode, a file is divided into many small tasks (byte ranges). Each completed
+# task is recorded as a line "start,end" in <prefix>.completed (by the main process only).
+
+COMPLETED = ".completed"
+
+def completed_path(path):
+    return path + COMPLETED
+
+def load_completed(path):
+    """ Returns the set of the completed tasks {(start, end), ...}."""
+    return set(load_checkpoints(path))
+
+def record_completed(path, start, end):
+    with CheckpointWriter(path) as writer:
+        writer.append(start, end)
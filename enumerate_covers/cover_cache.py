@@ -0,0 +1,103 @@
+"""
+@created: 2026-10-18
+
+@goal: Persistent cache of the number of covers of the 0-surgeries, per knot and per degree,
+        such that a computation for the degrees (a, b) only has to enumerate the degrees which
+        have not been computed before (e.g. when going from degree 7 to 8).
+
+The cache is a csv file with one line "knot,degree,num_covers" per computed count. It is only
+appended to (under the lock shared by the workers), every count is written as soon as it is
+computed. If the same count appears twice, the last line wins.
+"""
+
+import os
+
+
+COVER_CACHE = "cover_counts.csv"
+
+
+def load_cover_counts(path=COVER_CACHE, knots=None):
+    """ Returns the cached counts {knot: {degree: num_covers}} (of the given knots only, if specified)."""
+    counts = {}
+    if path is None or not os.path.isfile(path):
+        return counts
+    with open(path) as file:
+        for line in file:
+            # (a line that was only partially written is ignored)
+            if not line.endswith("\n"):
+                continue
+            knot, degree, num_covers = line.strip().split(",")
+            if knots is not None and knot not in knots:
+                continue
+            counts.setdefault(knot, {})[int(degree)] = int(num_covers)
+    return counts
+
+
+def missing_degrees(cached, deg_range):
+    """ The degrees in deg_range = (a, b) (inclusive) which are not in cached {degree: num_covers}."""
+    return [deg for deg in range(deg_range[0], deg_range[1] + 1) if deg not in cached]
+
+
+def append_cover_count(path, knot, degree, num_covers, lock=None):
+    """ Appends the count to the cache (path None -> nothing is written)."""
+    append_cover_counts(path, [(knot, degree, num_covers)], lock)
+
+
+def append_cover_counts(path, counts, lock=None):
+    """ Appends the counts [(knot, degree, num_covers), ...] to the cache in one write."""
+    _append_lines(path, ["{},{},{}\n".format(knot, degree, num_covers) for knot, degree, num_covers in counts], lock)
+
+
+def _append_lines(path, lines, lock=None):
+    if path is None or len(lines) == 0:
+        return
+
+    if lock is not None:
+        lock.acquire()
+    try:
+        # drop a line that was only partially written
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                torn = file.read(1) != b"\n"
+            if torn:
+                with open(path, "rb") as file:
+                    data = file.read()
+                os.truncate(path, data.rfind(b"\n") + 1)
+
+        with open(path, "a") as file:
+            file.write("".join(lines))
+            file.flush()
+            os.fsync(file.fileno())
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+#############################
+# Timeouts
+#
+# Every (knot, degree) whose enumeration was stopped after its time budget is recorded as a line
+# "knot,degree,budget" (budget in seconds) in TIMEOUTS, such that a later run can start it with
+# a larger budget right away (and one can see which computations did not terminate).
+
+TIMEOUTS = "cover_timeouts.csv"
+
+
+def load_timeouts(path=TIMEOUTS):
+    """ Returns {(knot, degree): largest budget after which it timed out}."""
+    timeouts = {}
+    if path is None or not os.path.isfile(path):
+        return timeouts
+    with open(path) as file:
+        for line in file:
+            if not line.endswith("\n"):
+                continue
+            knot, degree, budget = line.strip().split(",")
+            task = (knot, int(degree))
+            timeouts[task] = max(timeouts.get(task, 0), float(budget))
+    return timeouts
+
+
+def append_timeout(path, knot, degree, budget, lock=None):
+    _append_lines(path, ["{},{},{}\n".format(knot, degree, budget)], lock)
@@ -9,16 +9,20 @@ for the not yet distinguished 0-fillings.
 """
 
 import ast
+import concurrent.futures
 import csv
 from datetime import datetime
-import multiprocessing
+import heapq
+import math
 from pebble import ProcessPool
+import os
 import pickle
 import sys
 
 import census_csv_tools
-
-import snappy
+from presentation_cache import ZERO_SURGERY, get_presentation, preload_presentations
+from cover_cache import COVER_CACHE, load_cover_counts, missing_degrees, append_cover_count, append_cover_counts
+from cover_cache import TIMEOUTS, load_timeouts, append_timeout
 
 
 
@@ -45,32 +49,25 @@ def std_callback(future): # call back
         print(error.traceback)  # traceback of the function
 
 
-def compute_covers_zero_surgery(snappy_name, deg_range):
+def get_zero_surgery_presentation(snappy_name, presentations=None):
     """
     TODO: Verify if that is the correct filling!!!
 
-    This constructs the snappy manifold, copies it into regina, where it specifically needs 
-    to be considered as a SnapPea Triangulation. There one then can do fillings and have them solidified 
-    in the triangulation.
+    This takes the presentation of the fundamental group of the (0,1)-filling in snappy (from the cache
+    of presentations {knot: (generators, relators)} if it is in there, see presentation_cache.py) 
+    and constructs the group in regina. 
 
-    If one first Dehn-fills a knot in snappy and then copies it into Regina, the filling information 
-    will be lost!!!
+    If one first Dehn-fills a knot in snappy and then copies the manifold into Regina, the filling information 
+    will be lost!!! (hence the group is copied, not the triangulation)
     
     """
-    M = snappy.Manifold(snappy_name)
     # M_reg = SnapPeaTriangulation(Triangulation3(M))
     # REMARK: THE ABOVE IS NOT LOSSLESS. Information about longitude and meridian is not correctly transferred.
 
-    M.dehn_fill((0,1))
-
-    g_snappy = M.fundamental_group()
+    generators, relators = get_presentation(snappy_name, ZERO_SURGERY, cached=presentations)
 
     # in regina:
-    g_regina = GroupPresentation(len(g_snappy.generators()), g_snappy.relators())
-    num_covers = [len(g_regina.enumerateCovers(i)) for i in range(deg_range[0], deg_range[1]+1)]
-    
-    return num_covers
-
+    return GroupPresentation(len(generators), relators)
 
 
 OUTPUT_COLUMNS = ["representative","covers","members"]
@@ -83,44 +80,158 @@ def add_to_list(csv_file_path, row, columns, delimiter=","):
         writer.writerow(row)
 
 
-def distinguish_knotgroup_by_covers(group, deg_range, csv_output=None, lock=None):
-    # compute covers
-    covers = {knot:compute_covers_zero_surgery(knot, deg_range) for knot in group}
+def split_classes(classes, deg, counts):
+    """ Splits the classes [(covers, members), ...] which are not yet singletons by the number of
+    covers of degree deg (counts {knot: {degree: num_covers}} has to contain them)."""
+    new_classes = []
+    for covers, members in classes:
+        if len(members) == 1:
+            new_classes.append((covers, members))
+            continue
+
+        split = {}
+        for knot in members:
+            split.setdefault(counts[knot][deg], []).append(knot)
+        new_classes += [(covers + [num_covers], split[num_covers]) for num_covers in split]
+    return new_classes
+
 
-    # now make new groups:
+def group_by_covers(group, deg_range, counts):
+    """ Returns {str(covers): members}, with covers the list of the counts for all the degrees in deg_range."""
     new_groups = {}
-    for knot in covers.keys():
-        key = str(covers[knot])
+    for knot in group:
+        key = str([counts[knot][deg] for deg in range(deg_range[0], deg_range[1]+1)])
         if key in new_groups.keys():
             new_groups[key].append(knot)
         else:
             new_groups[key] = [knot]
-    
+    return new_groups
+
 
-    if csv_output == None:
-        return new_groups
+def write_groups(csv_output, new_groups):
+    """ Appends the groups {covers: members} as rows (representative, covers, members) to the file
+    (all the rows at once, such that a group is not written partially)."""
+    with open(csv_output, "a", newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=OUTPUT_COLUMNS)
+        writer.writerows([{"representative":new_groups[key][0], "covers":key, "members":new_groups[key]} for key in new_groups.keys()])
+
+
+#############################
+# Scheduling per (knot, degree)
+#
+# Instead of one task per group (where a single hard knot stalls its whole group, and a big group
+# runs on a single core), every (knot, degree) is a task of its own. The tasks which are ready are
+# started in the order of their estimated cost, the most expensive one first (longest processing
+# time first), such that the run does not end with a few long tasks on otherwise idle cores.
+# A group is advanced (and in the end written) as soon as all of its tasks are done.
+#
+# Every task first runs with the budget timeouts[0] (in seconds). A task that times out is recorded
+# (see cover_cache.py) and started again with the next budget of the ladder, but only once no cheaper
+# task is ready anymore. A group with a task that times out on the last budget (or raises an error) is
+# written to the timed out file (columns TIMED_OUT_COLUMNS) instead of the output, with the budget
+# (resp. the error) of the task.
+#
+# Reruns: The groups whose members are all in the output already are skipped. The groups of the timed out
+# file are retried (with the budgets larger than the recorded ones), and in the end the file is rewritten
+# with the groups that are still not written to the output.
+
+TIMEOUT_LADDER = [60, 600, 3600, 36000]
+
+TIMED_OUT_COLUMNS = ["representative", "timed_out", "members"]
+
+def get_timed_out_path(csv_out_path):
+    return csv_out_path.replace(".csv", "") + "_timed_out.csv"
+
+def load_written_knots(csv_out_path):
+    """ The set of the knots which are members of a group in the output file (empty if there is no file)."""
+    if not os.path.isfile(csv_out_path):
+        return set()
+    return set(knot for group in load_groups_from_csv(csv_out_path) for knot in group)
+
+def load_timed_out(timed_out_path):
+    """ {tuple(members): row} of the timed out file (empty if there is no file)."""
+    if not os.path.isfile(timed_out_path):
+        return {}
+    rows = census_csv_tools.load_knots_from_csv(timed_out_path, TIMED_OUT_COLUMNS)
+    return {tuple(ast.literal_eval(row["members"])):row for row in rows}
+
+def rewrite_timed_out(timed_out_path, timed_out, written_knots):
+    """ Replaces the timed out file by the rows of timed_out {tuple(members): row}, whose members are 
+    not all written to the output."""
+    rows = [row for members, row in timed_out.items() if not all(knot in written_knots for knot in members)]
+    if len(rows) == 0 and not os.path.isfile(timed_out_path):
+        return
+    with open(timed_out_path + ".tmp", "w", newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=TIMED_OUT_COLUMNS)
+        writer.writerows(rows)
+    os.replace(timed_out_path + ".tmp", timed_out_path)
+
+def first_level(timeouts, previous_budget):
+    """ The first level of the ladder whose budget is larger than the one the task already timed out with."""
+    if previous_budget is None:
+        return 0
+    for level, budget in enumerate(timeouts):
+        if budget is None or budget > previous_budget:
+            return level
+    return len(timeouts)
+
+def estimate_cover_cost(presentation, deg):
+    """ A rough estimate of the cost of enumerating the covers of degree deg: the number of
+    tuples of permutations for the generators (one of them can be fixed up to conjugation) times
+    the total length of the relators."""
+    if presentation is None:
+        return 0
+    generators, relators = presentation
+    return math.factorial(deg) ** max(len(generators) - 1, 1) * max(sum(len(rel) for rel in relators), 1)
+
+
+def compute_cover_count(snappy_name, deg, presentation=None):
+    """ The number of covers of degree deg of the 0-surgery (the task run by the workers)."""
+    presentations = {snappy_name:presentation} if presentation is not None else None
+    return len(get_zero_surgery_presentation(snappy_name, presentations).enumerateCovers(deg))
+
+
+def next_cover_tasks(state, deg_range, counts, escalate):
+    """
+    Advances the group as far as the known counts allow and returns the set of (knot, degree)
+    tasks it is waiting for (empty if the group is done).
 
-    # acquire lock if passed as argument
-    if lock != None:
-        lock.acquire()
+    state = {"group": [...], "classes": [(covers, members), ...], "deg": next degree} (see below)
+    """
+    if not escalate:
+        return set((knot, deg) for knot in state["group"] for deg in missing_degrees(counts.get(knot, {}), deg_range))
 
-    # print the groups
+    while state["deg"] <= deg_range[1]:
+        unresolved = [knot for _, members in state["classes"] if len(members) > 1 for knot in members]
+        if len(unresolved) == 0:
+            break
 
-    columns = ["representative", "covers", "members"]
+        tasks = set((knot, state["deg"]) for knot in unresolved if state["deg"] not in counts.get(knot, {}))
+        if len(tasks) > 0:
+            return tasks
 
-    for key in new_groups.keys():
-        row = {"representative":new_groups[key][0], "covers":key, "members":new_groups[key]}
-        add_to_list(csv_file_path=csv_output, row=row, columns=columns)
+        state["classes"] = split_classes(state["classes"], state["deg"], counts)
+        state["deg"] += 1
 
-    if lock != None:
-        lock.release()
+    return set()
 
 
-def distinguish_groups_by_covers_parallel(groups, deg_range, csv_out_path, num_workers, limit_num_groups=-1):
+def distinguish_groups_by_covers_parallel(groups, deg_range, csv_out_path, num_workers, limit_num_groups=-1, cache_path=COVER_CACHE, escalate=False,
+                                          timeouts=TIMEOUT_LADDER, timeouts_path=TIMEOUTS):
 
     """
     Computes the covers for the specified range of deg and 
     tries to distinguish the groups.
+
+    The counts already in the cache at cache_path are reused, only the missing degrees are enumerated.
+    With escalate=True, the degrees are computed one at a time and a group is only continued with
+    the next degree as long as it is not fully distinguished (the covers column then only contains
+    the degrees that were needed).
+
+    Every (knot, degree) is scheduled as a task of its own, the most expensive ones first, with the 
+    budgets of the ladder timeouts (None = no limit, see above).
+
+    The groups that are already written to csv_out_path (by an earlier run) are skipped.
     """
 
     total_start_time = datetime.today().now()
@@ -136,18 +247,146 @@ def distinguish_groups_by_covers_parallel(groups, deg_range, csv_out_path, num_w
     if limit_num_groups > 0:
         groups = groups[:limit_num_groups]
 
+    written_knots = load_written_knots(csv_out_path)
+    num_groups = len(groups)
+    groups = [group for group in groups if not all(knot in written_knots for knot in group)]
+    print("{} of {} groups are already in {}.".format(num_groups - len(groups), num_groups, csv_out_path))
+    if len(groups) == 0:
+        return
+
     # print("First 10 groups from the list:\n{}".format(groups[:10]))
     print("Group Size max: {}".format(max([len(group) for group in groups])))
     print("Number of groups: {}\n".format(len(groups)))
 
+    counts = load_cover_counts(cache_path, knots=set(knot for group in groups for knot in group))
+    num_missing = sum(len(missing_degrees(counts.get(knot, {}), deg_range)) for group in groups for knot in group)
+    print("Cached counts for {} knots, at most {} (knot, degree) pairs left to compute.\n".format(len(counts), num_missing))
+    sys.stdout.flush()
+
+    # the presentations of the knots which still have degrees to compute
+    presentations = preload_presentations([knot for group in groups for knot in group
+                                           if len(missing_degrees(counts.get(knot, {}), deg_range)) > 0],
+                                          num_workers=num_workers)
+
+    previous_timeouts = load_timeouts(timeouts_path)
+    timed_out_path = get_timed_out_path(csv_out_path)
+    timed_out = load_timed_out(timed_out_path)
+
+    states = [{"group":list(group), "classes":[([], list(group))], "deg":deg_range[0]} for group in groups]
+    pending = {}    # group idx -> set of the tasks the group is waiting for
+    waiting = {}    # task -> [group idx, ...] (for the tasks which are ready or running)
+    ready = []      # heap of (level, -estimated cost, task)
+    levels = {}     # task -> level in the ladder
+    num_written = 0
+    num_timed_out = 0
+    num_reported = 0
+
+    def give_up(task, reason):
+        """ Writes the groups waiting for the task to the timed out file (reason: the last budget or the error). """
+        nonlocal num_timed_out
+        for i in waiting.pop(task):
+            if i not in pending:
+                continue
+            del pending[i]
+            row = {"representative":states[i]["group"][0], "timed_out":[(task[0], task[1], reason)], "members":states[i]["group"]}
+            # (appended right away, in case the run is interrupted; the file is rewritten in the end)
+            if tuple(states[i]["group"]) not in timed_out:
+                add_to_list(timed_out_path, row, TIMED_OUT_COLUMNS)
+            timed_out[tuple(states[i]["group"])] = row
+            num_timed_out += 1
+
+    def push(task):
+        cost = estimate_cover_cost(presentations.get(task[0]), task[1])
+        heapq.heappush(ready, (levels[task], -cost, task))
+
+    def advance(i):
+        nonlocal num_written
+        tasks = next_cover_tasks(states[i], deg_range, counts, escalate)
+        if len(tasks) == 0:
+            if escalate:
+                new_groups = {str(covers):members for covers, members in states[i]["classes"]}
+            else:
+                new_groups = group_by_covers(states[i]["group"], deg_range, counts)
+            write_groups(csv_out_path, new_groups)
+            written_knots.update(states[i]["group"])
+            num_written += 1
+            return
+
+        pending[i] = tasks
+        for task in tasks:
+            if task not in waiting:
+                waiting[task] = []
+                levels[task] = first_level(timeouts, previous_timeouts.get(task))
+                if levels[task] < len(timeouts):
+                    push(task)
+            waiting[task].append(i)
+
+        # the tasks which already timed out on the whole ladder in an earlier run
+        for task in tasks:
+            if levels[task] == len(timeouts) and task in waiting:
+                give_up(task, previous_timeouts[task])
+
+    for i in range(len(states)):
+        advance(i)
+
+    print("{} groups were resolved from the cache, {} tasks to start with.\n".format(num_written, len(ready)))
+    sys.stdout.flush()
 
-    # Create lock and the pool
-    with multiprocessing.Manager() as manager:
-        lock = manager.Lock()
-        with ProcessPool(max_workers=num_workers) as pool:
-            for group in groups:
-                future = pool.schedule(distinguish_knotgroup_by_covers, args=(group, deg_range, csv_out_path, lock))
-                future.add_done_callback(std_callback)
+    with ProcessPool(max_workers=num_workers) as pool:
+        running = {}    # future -> task
+        while len(ready) > 0 or len(running) > 0:
+            # only as many tasks as workers are handed to the pool, such that the most expensive
+            # ready task is always the next one to start
+            while len(ready) > 0 and len(running) < num_workers:
+                _, _, task = heapq.heappop(ready)
+                future = pool.schedule(compute_cover_count, args=(task[0], task[1], presentations.get(task[0])),
+                                       timeout=timeouts[levels[task]])
+                running[future] = task
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                knot, deg = task
+                try:
+                    num_covers = future.result()
+                except concurrent.futures.TimeoutError:
+                    budget = timeouts[levels[task]]
+                    append_timeout(timeouts_path, knot, deg, budget)
+                    levels[task] += 1
+                    if levels[task] < len(timeouts):
+                        print("[{}] Degree {} timed out after {} seconds, will be retried with {}.".format(knot, deg, budget, timeouts[levels[task]]))
+                        push(task)
+                    else:
+                        print("[{}] Degree {} timed out after {} seconds, giving up.".format(knot, deg, budget))
+                        give_up(task, budget)
+                    sys.stdout.flush()
+                    continue
+                except Exception as error:
+                    print("[{}] Computing the covers of degree {} raised {}".format(knot, deg, repr(error)))
+                    give_up(task, repr(error))
+                    sys.stdout.flush()
+                    continue
+
+                counts.setdefault(knot, {})[deg] = num_covers
+                append_cover_count(cache_path, knot, deg, num_covers)
+
+                for i in waiting.pop(task):
+                    if i not in pending:
+                        continue
+                    pending[i].discard(task)
+                    if len(pending[i]) == 0:
+                        del pending[i]
+                        advance(i)
+
+                if num_written >= num_reported + 1000:
+                    num_reported = num_written
+                    print("{} / {} groups written.".format(num_written, len(states)))
+                    sys.stdout.flush()
+
+    rewrite_timed_out(timed_out_path, timed_out, written_knots)
+
+    print("{} / {} groups written.".format(num_written, len(states)))
+    print("{} groups timed out or failed (see {}).".format(num_timed_out, timed_out_path))
 
     total_end_time = datetime.today().now()
     print("---------------------------------------------")
@@ -162,6 +401,22 @@ def load_groups_from_csv(csv_file):
     rows = census_csv_tools.load_knots_from_csv(csv_file, OUTPUT_COLUMNS)
     return [ast.literal_eval(row["members"]) for row in rows]
 
+def seed_cover_cache_from_results(csv_file, deg_range, cache_path=COVER_CACHE):
+    """ Adds the counts from an earlier results file (computed for deg_range) to the cache,
+    for all the members of each group (they share the same counts).
+    """
+    cached_counts = load_cover_counts(cache_path)
+    new_counts = []
+    for row in census_csv_tools.load_knots_from_csv(csv_file, OUTPUT_COLUMNS):
+        covers = ast.literal_eval(row["covers"])
+        for knot in ast.literal_eval(row["members"]):
+            for deg, num_covers in zip(range(deg_range[0], deg_range[1]+1), covers):
+                if deg not in cached_counts.get(knot, {}):
+                    new_counts.append((knot, deg, num_covers))
+    append_cover_counts(cache_path, new_counts)
+    print("Added {} counts from {} to the cover cache.".format(len(new_counts), csv_file))
+    sys.stdout.flush()
+
 def get_nontrivial_groups(groups):
     new_groups = []
 
@@ -198,6 +453,10 @@ if __name__ == "__main__":
     groups = list(group_set)
 
 
+    # Reuse the counts of earlier runs.
+    if os.path.isfile(csv_out_path):
+        seed_cover_cache_from_results(csv_out_path, deg_range)
+
     # Now run the main code.
     distinguish_groups_by_covers_parallel(groups, (2,6), csv_out_path, num_workers=num_workers)
 
@@ -215,7 +474,10 @@ if __name__ == "__main__":
     sys.stdout.flush()
 
     csv_out_path_7 = "results2-7.csv"
-    distinguish_groups_by_covers_parallel(remaining_groups, (2,7), csv_out_path_7, num_workers=num_workers)
+    if os.path.isfile(csv_out_path_7):
+        seed_cover_cache_from_results(csv_out_path_7, (2,7))
+
+    distinguish_groups_by_covers_parallel(remaining_groups, (2,7), csv_out_path_7, num_workers=num_workers, escalate=True)
 
     print("We have completed computing the number of degree 7 covers for the remaining knots.")
     resulting_groups_7 = load_groups_from_csv(csv_out_path_7) 
@@ -1,6 +1,7 @@
 from census_csv_tools import *
 
 import ast
+import os
 
 def get_num_elements(list_str):
    return len(ast.literal_eval(list_str))
@@ -36,7 +37,7 @@ def join_all_groups(generated_groups):
             all_elements_generated.add(e)
     return all_elements_generated
 
-def compile_results(filepath_7, filepath_6):
+def compile_results(filepath_7, filepath_6, timed_out_path=None):
     # rk: The old groups contain the result from the computation of deg 2-6 covers.
     old_groups = load_knots_from_csv(filepath_6, columns=["rep", "covers", "group"], delimiter=",")
     old_non_trivial = [g for g in old_groups if get_num_elements(g["group"]) != 1]
@@ -46,8 +47,13 @@ def compile_results(filepath_7, filepath_6):
     print("Created a set of all processed knots.")
 
     # Rk: Some of the groups (4) where not processed, since the computation didn't terminate.
-    # Suffices to not find the representative in the generated elements.
-    non_processed_groups = [g for g in old_non_trivial if g["rep"] not in all_elements_generated]
+    # These are recorded in the timed out file (see covers.py), for older runs
+    # it suffices to not find the representative in the generated elements.
+    if timed_out_path is not None and os.path.isfile(timed_out_path):
+        timed_out_groups = load_knots_from_csv(timed_out_path, columns=["rep", "timed_out", "group"], delimiter=",")
+        non_processed_groups = [{"rep":g["rep"], "covers":g["timed_out"], "group":g["group"]} for g in timed_out_groups]
+    else:
+        non_processed_groups = [g for g in old_non_trivial if g["rep"] not in all_elements_generated]
 
     # Compile the left over groups.
     non_resolved_groups = non_processed_groups + [g for g in generated_groups if get_num_elements(g["group"]) != 1]
@@ -71,4 +77,4 @@ if __name__ == "__main__":
 
     print("\n-----------------------------\n")
     print("Now compiling the results...")
-    compile_results(filepath_7, filepath_6)
+    compile_results(filepath_7, filepath_6, timed_out_path="results2-7_timed_out.csv")
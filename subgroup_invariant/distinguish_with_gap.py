@@ -6,18 +6,21 @@ Goal: Given an input list of lists containing the knots to be distinguished
 
 """
 import ast
+import concurrent.futures
 import csv
 from collections import Counter
 from datetime import datetime
+import hashlib
 import multiprocessing
 
 import os
 from pebble import ProcessPool
 import sys
+import threading
 
 import census_csv_tools
-
-import snappy
+from gap_pool import GAP_COMMAND, GAP_LIBRARY, GapError, GapPool, GapSession
+from presentation_cache import ZERO_SURGERY, get_presentation, preload_presentations
 
 ########
 ###### Call back functions:
@@ -33,23 +36,26 @@ def std_callback(future): # call back
 
 ########
 
-def get_gap_group_presentation(snappy_group, split_str="_"):
+def get_gap_group_presentation(presentation, split_str="_"):
     """
-        A group in snappy is described by 
-            snappy_group.generators() , i.e. ['a', 'b']
+        A group (as in snappy) is described by the presentation (generators, relators), 
+            generators , i.e. ['a', 'b']
             and
-            snappy_group.relators() , i.e. ["rel1", "rel2",...]
+            relators , i.e. ["rel1", "rel2",...]
+        (see presentation_cache.py)
 
         For our gap program, we want to concatenate the relations into a single string of the form
         "1=rel1=rel2=...".
     """
+    generators, relators = presentation
+
     rel_str = "1"
-    for rel in snappy_group.relators():
+    for rel in relators:
         rel_str += "=" + rel
 
-    assert(len(snappy_group.generators()) <= 26)
+    assert(len(generators) <= 26)
     gen_str = ""
-    for g in snappy_group.generators():
+    for g in generators:
         gen_str += g + split_str
 
     # Remove trailing '_'
@@ -64,43 +70,242 @@ def get_gap_group_presentation(snappy_group, split_str="_"):
 # DECISION: Writing the list of generators as a string. But for this have to assert that there are at
 #           most 26 generators, else we run into trouble.
 
-def write_dehnfilled_group_description_to_csv(outpath, snappy_name):
-    mfld = snappy.Manifold(snappy_name)
-    mfld.dehn_fill((0,1))
+BATCH_COLUMNS = ["name", "generator_str", "relator_str", "min_index"]
 
-    f_group_description = get_gap_group_presentation(mfld.fundamental_group())
+def write_dehnfilled_group_description_to_csv(outpath, snappy_name, presentations=None, min_index=1):
+    f_group_description = get_gap_group_presentation(get_presentation(snappy_name, ZERO_SURGERY, cached=presentations))
 
     row = {"name":snappy_name, 
            "generator_str": f_group_description["generator_str"], 
-           "relator_str":f_group_description["relator_str"] }
+           "relator_str":f_group_description["relator_str"],
+           "min_index":min_index }
     
-    pass # TODO: Fill this out perhaps if want to do a bit of batch-processing
+    if not os.path.isfile(outpath):
+        census_csv_tools.print_knots_to_csv([], BATCH_COLUMNS, outpath)
+    add_to_list(outpath, row, columns=BATCH_COLUMNS)
+
+
+#
+# Batch-processing: Instead of one GAP call per knot, the presentations of many knots are written
+# to a batch file (columns BATCH_COLUMNS), which a single GAP session processes with
+# ComputeInvariantsOfFile (see subgroup_invariant.g). The session prints one record per knot as
+# soon as it is computed, which is directly appended to the invariants csv. Hence, after a restart
+# only the knots which are not yet in the csv are processed again.
+#
+
+RECORD_MARKER = "@@RECORD"
+
+# the GAP functions computing the invariant of the tier (see subgroup_invariant.g)
+TIER_FUNCTIONS = {"full": "ComputeInvariantOfIndices", "cheap": "ComputeCheapInvariantOfIndices"}
+
+def write_batch_file(batch_path, knots, presentations, split_str="_", lower={}):
+    rows = []
+    for knot in knots:
+        gap_presentation = get_gap_group_presentation(presentations[knot], split_str)
+        rows.append({"name":knot, 
+                     "generator_str": gap_presentation["generator_str"], 
+                     "relator_str":gap_presentation["relator_str"],
+                     "min_index":get_min_index(lower.get(knot))})
+    census_csv_tools.print_knots_to_csv(rows, BATCH_COLUMNS, batch_path)
+
+def run_gap_batch(batch_path, max_index, csv_out_path, lock, split_str="_", gap_command=GAP_COMMAND, lower={}, tier="full",
+                  timeout=None, memory_limit=None):
+    """ Runs a GAP session on the batch file and appends each record to the csv as it arrives
+    (merged with the lower indices, see load_lower_invariants). Returns the number of records.
+
+    The session is a GapSession (see gap_pool.py). If a knot raises an error in GAP, or its record does
+    not arrive within <timeout> seconds (or the session exceeds the memory limit), the knot is reported 
+    and skipped, and a new session continues with the remaining knots of the batch (in <batch_path>.rest).
+    """
+    remaining = census_csv_tools.load_knots_from_csv(batch_path, columns=BATCH_COLUMNS)
+    path = batch_path
+
+    num_records = 0
+    session = GapSession(gap_command, GAP_LIBRARY, memory_limit)
+    try:
+        while len(remaining) > 0:
+            done = set()
+            error = "no record"
+            try:
+                statement = 'ComputeInvariantsOfFileOfTier("{}", "{}", {}, "{}");;'.format(path, split_str, max_index, tier)
+                for line in session.stream(statement, timeout):
+                    if line.startswith("Error"):
+                        error = line
+                    if not line.startswith(RECORD_MARKER):
+                        continue
+                    knot, _, output = line[len(RECORD_MARKER):].strip().partition(" ")
+                    row = {"knot": knot, "invariant":encode_invariant(merge_invariant_layers(lower.get(knot), parse_gap_invariant(output)))}
+                    with lock:
+                        add_to_list(csv_out_path, row, columns=["knot", "invariant"])
+                    done.add(knot)
+                    num_records += 1
+            except TimeoutError as timeout_error:
+                error = "no record after {} seconds".format(timeout_error.args[1])
+            except GapError as gap_error:
+                error = "GAP exited: {}".format(gap_error)
+
+            # (the records arrive in the order of the batch, the first missing knot is the one that failed)
+            remaining = [row for row in remaining if row["name"] not in done]
+            if len(remaining) > 0:
+                print("[{}] Skipped in the batch {}: {}".format(remaining[0]["name"], batch_path, error))
+                sys.stdout.flush()
+                remaining = remaining[1:]
+                path = batch_path + ".rest"
+                census_csv_tools.print_knots_to_csv(remaining, BATCH_COLUMNS, path)
+    finally:
+        session.stop()
+    return num_records
+
+def get_knots_of_groups(groups_csv_path, columns):
+    """ All the knots of the groups (in order, each once)."""
+    groups_csv = census_csv_tools.load_knots_from_csv(groups_csv_path, columns)
+    return list(dict.fromkeys(knot for row in groups_csv for knot in ast.literal_eval(row["group"])))
+
+def compute_invariants_in_batches(knots, csv_out_path, max_index, num_sessions, batch_prefix="batch", split_str="_", gap_command=GAP_COMMAND,
+                                  reuse_lower_indices=True, tier="full", timeout=None, memory_limit=None):
+    """
+    Computes the invariants of the knots (which are not yet in csv_out_path) in num_sessions GAP sessions,
+    each processing one batch file <batch_prefix>_<i>.csv.
+    With reuse_lower_indices, only the subgroups of the indices which are not yet computed are considered
+    (see load_lower_invariants). tier: "full" or "cheap" (see the tiers below).
+    timeout: the maximal time per knot, memory_limit: of each GAP session (see run_gap_batch).
+    """
+    already_computed_knots = set()
+    if os.path.isfile(csv_out_path):
+        already_computed_knots = census_csv_tools.load_first_column_as_set(csv_out_path, ["knot", "invariant"], ",")
+    knots = [knot for knot in dict.fromkeys(knots) if knot not in already_computed_knots]
 
+    presentations = preload_presentations(knots, num_workers=num_sessions)
+    knots = [knot for knot in knots if knot in presentations]
+    print("Computing the invariants of {} knots in {} batches.".format(len(knots), num_sessions))
+
+    lower = load_lower_invariants(knots, max_index, tier) if reuse_lower_indices else {}
+    print("For {} knots the invariant of a lower index is reused.".format(len(lower)))
+    sys.stdout.flush()
+
+    batch_paths = []
+    for i in range(min(num_sessions, len(knots))):
+        batch_paths.append("{}_{}.csv".format(batch_prefix, i))
+        write_batch_file(batch_paths[i], knots[i::num_sessions], presentations, split_str, lower)
+
+    lock = threading.Lock()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_sessions) as executor:
+        futures = [executor.submit(run_gap_batch, batch_path, max_index, csv_out_path, lock, split_str, gap_command, lower, tier, timeout, memory_limit)
+                   for batch_path in batch_paths]
+        num_records = sum(future.result() for future in futures)
+
+    print("Received {} of {} records.".format(num_records, len(knots)))
+    sys.stdout.flush()
 
-def compute_invariant_in_gap(snappy_group, max_index, split_str="_"):
-    gap_presentation = get_gap_group_presentation(snappy_group)
 
-    command = "./get_inv.sh {} {} {} {}".format(gap_presentation["generator_str"], gap_presentation["relator_str"], split_str, max_index)
+def compute_invariant_in_gap(presentation, max_index, split_str="_", min_index=1):
+    gap_presentation = get_gap_group_presentation(presentation)
+
+    command = "./get_inv.sh {} {} {} {} {}".format(gap_presentation["generator_str"], gap_presentation["relator_str"], split_str, max_index, min_index)
     print("The command: \n", command, "\n")
     sys.stdout.flush()
     stream = os.popen(command)
-    output = stream.read().replace("\n", "").replace(" ", "")
+    return parse_gap_invariant(stream.read())
+
+def _to_tuple(x):
+    return tuple(_to_tuple(y) for y in x) if type(x)==list else x
+
+def parse_gap_invariant(output):
+    """ Turns the printed invariant, i.e. the collected list [[subgroup invariant, count], ...], into
+    a multiset (Counter) of tuples."""
+    output = output.replace("\n", "").replace(" ", "")
     
     #
     # Remark: We also want to make sure that all the inner lists are considered tuples in python, so that order is
     #           immutable and we can hash.
     #
 
-    list_invariant = ast.literal_eval(output)
-    multiset_invariant = Counter([tuple(tuple(x) if type(x)==list else x for x in ll) for ll in list_invariant])
+    collected_invariant = ast.literal_eval(output)
+    multiset_invariant = Counter({_to_tuple(subgroup_invariant):count for subgroup_invariant, count in collected_invariant})
     
     # REMARK: We use a multiset (counter), because sometimes there are two distinct conjugate classes of
     #           subgroups of the same index with same information.
 
-    # Counter objects are still hashable, so we can nicely compare two multisets.
-
     return multiset_invariant
 
+
+#
+# Canonical encoding: An invariant is stored as the sorted tuple of its (subgroup invariant, count)
+# pairs, printed without spaces, e.g. "(((1,1,(0,),(0,)),1),((2,2,(0,5),(0,5)),1))". Equal invariants
+# have equal encodings, hence equal digests, and the knots of a group are split by the digest of
+# their invariants (instead of comparing the invariants pairwise).
+#
+
+def encode_invariant(invariant):
+    """ The canonical string of the invariant (a multiset {subgroup invariant: count})."""
+    return repr(tuple(sorted(invariant.items()))).replace(" ", "")
+
+def decode_invariant(invariant_str):
+    """ The invariant (Counter) of its encoding (or of the dict string of older files)."""
+    invariant = ast.literal_eval(invariant_str)
+    if type(invariant) == dict:
+        return Counter(invariant)
+    return Counter(dict(invariant))
+
+def invariant_digest(invariant):
+    """ A digest of the canonical encoding (the same in every run, unlike hash())."""
+    return hashlib.sha1(encode_invariant(invariant).encode()).hexdigest()
+
+def reencode_invariants_file(invariants_path, out_path):
+    """ Writes the invariants of the file (e.g. with the dict strings of older files) in the canonical encoding."""
+    invariants = census_csv_tools.load_knots_from_csv(invariants_path, columns=["knot", "invariant"])
+    for row in invariants:
+        add_to_list(out_path, {"knot": row["knot"], "invariant":encode_invariant(decode_invariant(row["invariant"]))}, columns=["knot", "invariant"])
+
+def compute_invariant_in_gap_pool(gap_pool, presentation, max_index, split_str="_", lower=None, tier="full"):
+    """ As compute_invariant_in_gap, but in one of the running GAP sessions of the pool (see gap_pool.py).
+    (Merged with the lower indices, see load_lower_invariants)"""
+    gap_presentation = get_gap_group_presentation(presentation, split_str)
+
+    expression = '{}("{}", "{}", "{}", {}, {})'.format(TIER_FUNCTIONS[tier],
+        gap_presentation["generator_str"], gap_presentation["relator_str"], split_str, get_min_index(lower), max_index)
+    return merge_invariant_layers(lower, parse_gap_invariant(gap_pool.run(expression)))
+
+
+#
+# Reusing the lower indices: The invariant up to index n is the multiset of the invariants of the
+# subgroups of index <= n (the first entry of each is the index). Hence, given the invariant up to
+# index k for a knot, the invariant up to n only needs the subgroups of index k+1, ..., n.
+#
+
+def get_invariants_path(max_index, tier="full"):
+    if tier == "cheap":
+        return "subgrpinv_cheap_upto_" +  str(max_index) + ".csv"
+    return "subgrpinv_upto_" +  str(max_index) + ".csv"
+
+def load_lower_invariants(knots, max_index, tier="full"):
+    """
+    For each of the knots, the invariant up to the largest index k < max_index which was computed before
+    (in get_invariants_path(k, tier)): {knot: (k, invariant)}.
+    """
+    lower = {}
+    remaining = set(knots)
+    for k in range(max_index - 1, 0, -1):
+        if len(remaining) == 0:
+            break
+        if not os.path.isfile(get_invariants_path(k, tier)):
+            continue
+        for row in census_csv_tools.load_knots_from_csv(get_invariants_path(k, tier), ["knot", "invariant"]):
+            if row["knot"] in remaining:
+                lower[row["knot"]] = (k, decode_invariant(row["invariant"]))
+        remaining.difference_update(lower)
+    return lower
+
+def get_min_index(lower):
+    return 1 if lower is None else lower[0] + 1
+
+def merge_invariant_layers(lower, invariant):
+    """ The invariant up to max_index from the one up to k (lower = (k, invariant) or None) and the
+    one of the subgroups of index k+1, ..., max_index."""
+    if lower is None:
+        return invariant
+    return lower[1] + invariant
+
 def add_to_list(csv_file_path, row, columns, delimiter=","):
     """ Appends a row to the file."""
 
@@ -108,12 +313,11 @@ def add_to_list(csv_file_path, row, columns, delimiter=","):
         writer = csv.DictWriter(file, fieldnames=columns, delimiter=delimiter)
         writer.writerow(row)
 
-def compute_invariant_to_csv(snappy_name, max_index, csv_out_path, lock):
-    mfld = snappy.Manifold(snappy_name)
-    mfld.dehn_fill((0,1))
+def compute_invariant_to_csv(snappy_name, max_index, csv_out_path, lock, presentations=None, lower=None):
+    presentation = get_presentation(snappy_name, ZERO_SURGERY, cached=presentations, lock=lock)
 
-    invariant = compute_invariant_in_gap(mfld.fundamental_group(), max_index)
-    row = {"knot": snappy_name, "invariant":dict(invariant)}
+    invariant = merge_invariant_layers(lower, compute_invariant_in_gap(presentation, max_index, min_index=get_min_index(lower)))
+    row = {"knot": snappy_name, "invariant":encode_invariant(invariant)}
 
     # acquire the lock
     if lock != None:
@@ -126,12 +330,48 @@ def compute_invariant_to_csv(snappy_name, max_index, csv_out_path, lock):
         lock.release()
 
 
-def compute_invariants_in_parallel(groups_csv_path, columns, csv_out_path, num_workers, already_computed_knots):
+def compute_invariants_in_gap_pool(knots, presentations, csv_out_path, max_index, num_workers, lower={}, timeout=None, memory_limit=None, tier="full"):
+    """ Computes the invariants of the knots in a pool of num_workers GAP sessions (see gap_pool.py)
+    and appends them to the csv as they are done."""
+    for knot in knots:
+        if knot not in presentations:
+            print("[{}] No presentation, skipped.".format(knot))
+    knots = [knot for knot in knots if knot in presentations]
+
+    with GapPool(num_workers, memory_limit=memory_limit, timeout=timeout) as gap_pool:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = {executor.submit(compute_invariant_in_gap_pool, gap_pool, presentations[knot], max_index, "_", lower.get(knot), tier):knot
+                       for knot in knots}
+
+            # (only this thread writes to the output)
+            for future in concurrent.futures.as_completed(futures):
+                knot = futures[future]
+                try:
+                    invariant = future.result()
+                except TimeoutError as error:
+                    print("[{}] Ended computation after {} seconds".format(knot, error.args[1]))
+                    continue
+                except Exception as error:
+                    print("[{}] Function raised {}".format(knot, error))
+                    continue
+                add_to_list(csv_out_path, {"knot": knot, "invariant":encode_invariant(invariant)}, columns=["knot", "invariant"])
+                sys.stdout.flush()
+
+        print("The GAP sessions were restarted {} times.".format(gap_pool.num_restarts()))
+
+
+def compute_invariants_in_parallel(groups_csv_path, columns, csv_out_path, num_workers, already_computed_knots=[], max_index=5,
+                                   use_gap_pool=True, timeout=None, memory_limit=None, reuse_lower_indices=True):
     """Computes the subgroup invariant upto the given index for all the knots appearing in the groups_csv file.
 
     Arguments:
         - groups_csv_path: CSV file with headers given by <columns>, at least containing "rep" and "group".
         - out_csv_path: Will output with columns ["knot", "invariant"] to the output file. 
+        - use_gap_pool: Run the jobs in num_workers long-lived GAP sessions (see gap_pool.py) with the
+                        given timeout (seconds) and memory_limit (e.g. "4g") per job, 
+                        instead of one ./get_inv.sh call per knot.
+        - reuse_lower_indices: Only compute the subgroups of the indices which are not yet computed 
+                        (see load_lower_invariants).
     """
     total_start_time = datetime.today().now()
     print("---------------------------------------------")
@@ -144,19 +384,38 @@ def compute_invariants_in_parallel(groups_csv_path, columns, csv_out_path, num_w
 
     groups_csv = census_csv_tools.load_knots_from_csv(groups_csv_path, columns)
 
-    # Create lock and the pool
-    with multiprocessing.Manager() as manager:
-        lock = manager.Lock()
-        with ProcessPool(max_workers=num_workers) as pool:
-            for row in groups_csv:
-                group = ast.literal_eval(row["group"])
-
-                for knot in group:
-                    if knot in already_computed_knots:
-                        print("Already computed the invariant for {}.".format(knot))
-                        continue
-                    future = pool.schedule(compute_invariant_to_csv, args=(knot, max_index, csv_out_path, lock))
-                    future.add_done_callback(std_callback)
+    # Start all the workers from the cached presentations
+    knots = set(knot for row in groups_csv for knot in ast.literal_eval(row["group"]))
+    presentations = preload_presentations(knots.difference(already_computed_knots), num_workers=num_workers)
+
+    lower = load_lower_invariants(knots.difference(already_computed_knots), max_index) if reuse_lower_indices else {}
+    print("For {} knots the invariant of a lower index is reused.".format(len(lower)))
+
+    if use_gap_pool:
+        knots_to_compute = []
+        for row in groups_csv:
+            for knot in ast.literal_eval(row["group"]):
+                if knot in already_computed_knots:
+                    print("Already computed the invariant for {}.".format(knot))
+                elif knot not in knots_to_compute:
+                    knots_to_compute.append(knot)
+
+        compute_invariants_in_gap_pool(knots_to_compute, presentations, csv_out_path, max_index, num_workers, lower, timeout, memory_limit)
+
+    else:
+        # Create lock and the pool
+        with multiprocessing.Manager() as manager:
+            lock = manager.Lock()
+            with ProcessPool(max_workers=num_workers) as pool:
+                for row in groups_csv:
+                    group = ast.literal_eval(row["group"])
+
+                    for knot in group:
+                        if knot in already_computed_knots:
+                            print("Already computed the invariant for {}.".format(knot))
+                            continue
+                        future = pool.schedule(compute_invariant_to_csv, args=(knot, max_index, csv_out_path, lock, {knot:presentations[knot]} if knot in presentations else None, lower.get(knot)))
+                        future.add_done_callback(std_callback)
 
     total_end_time = datetime.today().now()
     print("---------------------------------------------")
@@ -166,9 +425,48 @@ def compute_invariants_in_parallel(groups_csv_path, columns, csv_out_path, num_w
 
     sys.stdout.flush()
 
+def merge_groups(groups):
+    """ Merges the groups by transitivity, i.e. groups (a,b,c,d), (a,b,c) become a single group (as a set)."""
+
+    # Merge the groups:(Rk. Turning into sets! More reasonable.)
+
+    merged_group_sets = []
+    for group in groups:        
+        already_merged = False
+
+        for gr_set in merged_group_sets:
+            # No break after one non-trivial intersection to catch errors.
+            if len(gr_set.intersection(group)) != 0:
+                assert(not already_merged)
+
+                gr_set.update(group)
+
+                already_merged = True
+        
+        if not already_merged:
+            merged_group_sets.append(set(group))
+
+    return merged_group_sets
+
+def split_by_invariant(knots, invariant_dict):
+    """ Splits the knots by their invariant: [{"invariant":encoding, "group":[knots with this invariant]}, ...]
+    (knots without an invariant in invariant_dict form one class with invariant None)"""
+    partial_distinction = {}
+    for knot in knots:
+        invariant = invariant_dict.get(knot)
+        digest = None if invariant is None else invariant_digest(invariant)
+        if digest not in partial_distinction:
+            partial_distinction[digest] = {"invariant":None if invariant is None else encode_invariant(invariant), "group":[]}
+        partial_distinction[digest]["group"] += [knot]
+    return list(partial_distinction.values())
+
 def distinguish_groups(csv_group_path, group_columns, invariants_path, invariants_columns, csv_out_new_path):
     invariants = census_csv_tools.load_knots_from_csv(invariants_path, columns=invariants_columns)
-    invariant_dict = {row["knot"]:ast.literal_eval(row["invariant"]) for row in invariants}
+    invariant_dict = {}
+    digests = {}  # knot -> the digests of its rows
+    for row in invariants:
+        invariant_dict[row["knot"]] = decode_invariant(row["invariant"])
+        digests.setdefault(row["knot"], Counter())[invariant_digest(invariant_dict[row["knot"]])] += 1
     
     # print(invariant_dict)
     print("Num keys in the invariant dict: {}\n".format(len(invariant_dict.keys())))
@@ -184,38 +482,17 @@ def distinguish_groups(csv_group_path, group_columns, invariants_path, invariant
     print("\n----\n")
     print("Remark: There are some duplicates in our list of knots!\n")
     # Find some duplicates:
-    keys = []
-    duplicates = set({})
-    for row in invariants:
-        if row["knot"] not in keys:
-            keys += [row["knot"]]
-        else:
-            duplicates.add(row["knot"])
+    duplicates = set(knot for knot, knot_digests in digests.items() if sum(knot_digests.values()) > 1)
     
     # print("Duplicates: {}".format(duplicates))
     print("There are {} distinct knots appearing more than once.".format(len(duplicates)))
+    print("Of these, {} appear with different invariants.".format(len([knot for knot in duplicates if len(digests[knot]) > 1])))
 
     print("\n........................\n")
     print("We will now merge the list (by transitivity...)!")
     print("I.e. groups of the form (a,b,c,d), (a,b,c) will be combined to be a single group")
 
-    # Merge the groups:(Rk. Turning into sets! More reasonable.)
-
-    merged_group_sets = []
-    for group in groups:        
-        already_merged = False
-
-        for gr_set in merged_group_sets:
-            # No break after one non-trivial intersection to catch errors.
-            if len(gr_set.intersection(group)) != 0:
-                assert(not already_merged)
-
-                gr_set.update(group)
-
-                already_merged = True
-        
-        if not already_merged:
-            merged_group_sets.append(set(group))
+    merged_group_sets = merge_groups(groups)
 
     # Now distinguish knots.
 
@@ -226,16 +503,7 @@ def distinguish_groups(csv_group_path, group_columns, invariants_path, invariant
 
     for group_set in merged_group_sets:
 
-        partial_distinction_list = []
-        for knot in group_set:
-            found_match = False
-            for subgroup in partial_distinction_list:
-                if subgroup["invariant"] == invariant_dict[knot]:
-                    subgroup["group"] += [knot]
-                    found_match = True
-                    break
-            if not found_match:
-                partial_distinction_list += [{"invariant":invariant_dict[knot], "group":[knot]}]
+        partial_distinction_list = split_by_invariant(group_set, invariant_dict)
         
         # check if new groups created
         if len(partial_distinction_list) != 1:
@@ -259,6 +527,86 @@ def distinguish_groups(csv_group_path, group_columns, invariants_path, invariant
 
             
 
+#
+# Tiers: The cheap invariant (index and abelianization of every subgroup) is computed for all the knots
+# first, the full invariant (which also needs the cores) only for the knots which are still in a
+# group with another knot of the same cheap invariant. Since the cheap invariant of a subgroup is
+# the projection of the full one, the groups are then split by the cheap invariant and the
+# remaining groups by the full invariant.
+#
+
+def load_invariants(invariants_path):
+    """ {knot: invariant} of the invariants csv (empty if there is no file)."""
+    if not os.path.isfile(invariants_path):
+        return {}
+    invariants = census_csv_tools.load_knots_from_csv(invariants_path, columns=["knot", "invariant"])
+    return {row["knot"]:decode_invariant(row["invariant"]) for row in invariants}
+
+def cheap_of_full_invariant(invariant):
+    """ The cheap invariant (Index(G,H), AbelianInvariants(H)) of each subgroup, from the full one."""
+    cheap = Counter()
+    for subgroup_invariant, count in invariant.items():
+        cheap[(subgroup_invariant[0], subgroup_invariant[2])] += count
+    return cheap
+
+def compute_tier(knots, tier, max_index, num_workers, use_batches=False, timeout=None, memory_limit=None):
+    """ Computes the invariants of the tier for the knots which do not have them yet, returns the invariants of all of them."""
+    invariants_path = get_invariants_path(max_index, tier)
+    invariants = load_invariants(invariants_path)
+    missing = [knot for knot in knots if knot not in invariants]
+
+    print("Tier {}: {} knots, {} to compute.".format(tier, len(knots), len(missing)))
+    sys.stdout.flush()
+
+    if len(missing) > 0:
+        if use_batches:
+            compute_invariants_in_batches(missing, invariants_path, max_index, num_workers, batch_prefix="batch_" + tier, tier=tier,
+                                          timeout=timeout, memory_limit=memory_limit)
+        else:
+            presentations = preload_presentations(missing, num_workers=num_workers)
+            lower = load_lower_invariants(missing, max_index, tier)
+            compute_invariants_in_gap_pool(missing, presentations, invariants_path, max_index, num_workers, lower, timeout, memory_limit, tier)
+        invariants = load_invariants(invariants_path)
+
+    return {knot:invariants[knot] for knot in knots if knot in invariants}
+
+def distinguish_groups_tiered(csv_group_path, group_columns, max_index, csv_out_new_path, num_workers, use_batches=False, timeout=None, memory_limit=None):
+    """ As compute_invariants_in_parallel + distinguish_groups, but with the invariant in two tiers (see above)."""
+    assert("group" in group_columns)
+
+    group_list = census_csv_tools.load_knots_from_csv(csv_group_path, columns=group_columns)
+    merged_group_sets = merge_groups([ast.literal_eval(row["group"]) for row in group_list])
+    knots = [knot for group_set in merged_group_sets for knot in sorted(group_set)]
+
+    # 1) The cheap tier (derived from the full invariant if that one is already known)
+    full_invariants = {knot:invariant for knot, invariant in load_invariants(get_invariants_path(max_index)).items() if knot in set(knots)}
+    derived = {knot:cheap_of_full_invariant(full_invariants[knot]) for knot in full_invariants}
+    cheap_invariants = compute_tier([knot for knot in knots if knot not in derived], "cheap", max_index, num_workers, use_batches, timeout, memory_limit)
+    cheap_invariants.update(derived)
+
+    cheap_classes = []
+    for group_set in merged_group_sets:
+        cheap_classes += split_by_invariant(sorted(group_set), cheap_invariants)
+
+    # 2) The full tier for the knots which are not yet distinguished
+    core_knots = [knot for cls in cheap_classes if len(cls["group"]) > 1 for knot in cls["group"]]
+    print("The cheap tier distinguishes {} of {} knots.\n".format(len(knots) - len(core_knots), len(knots)))
+    full_invariants.update(compute_tier([knot for knot in core_knots if knot not in full_invariants], "full", max_index, num_workers, use_batches, timeout, memory_limit))
+
+    non_singleton_groups = []
+    for cls in cheap_classes:
+        if len(cls["group"]) == 1:
+            continue
+        for grp in split_by_invariant(cls["group"], full_invariants):
+            if len(grp["group"]) > 1:
+                non_singleton_groups.append(grp)
+
+    print("The new distinction list contains {} non-trivial groups.\n".format(len(non_singleton_groups)))
+
+    # Now printing them to file.
+    census_csv_tools.print_knots_to_csv(non_singleton_groups, columns=["group", "invariant"], csv_file_path=csv_out_new_path)
+
+
 #
 # Note: deg 4 subgroups were computed for all ~9000 knots in ~1h50min.(4 cores)
 # Note: deg 5 subgroups for 7500 knots in 2h (16 cores)
@@ -267,6 +615,8 @@ def distinguish_groups(csv_group_path, group_columns, invariants_path, invariant
 if __name__ == "__main__":
     print("--------Start: Deg5 Invariants----------------")
     recompute_invariant = False
+    # one GAP session per batch file instead of one job per knot (see compute_invariants_in_batches)
+    use_batches = False
 
     max_index = 5
     in_groups_name = "groups_of_same_volume_alex_knotFloer_coversdeg7"
@@ -274,13 +624,16 @@ if __name__ == "__main__":
     in_groups_csv = in_groups_folder + in_groups_name + ".csv"
     group_columns = ["rep","covers","group"]
     
-    invariants_path = "subgrpinv_upto_" +  str(max_index) + ".csv"
+    invariants_path = get_invariants_path(max_index)
     inv_columns = ["knot","invariant"]
 
     csv_grps_idx5_path = in_groups_name + "_subgrpIdx5" + ".csv"
 
     if recompute_invariant or not os.path.isfile(invariants_path):
-        compute_invariants_in_parallel(in_groups_csv, columns=group_columns, csv_out_path=invariants_path, num_workers=16)
+        if use_batches:
+            compute_invariants_in_batches(get_knots_of_groups(in_groups_csv, group_columns), invariants_path, max_index, num_sessions=16)
+        else:
+            compute_invariants_in_parallel(in_groups_csv, columns=group_columns, csv_out_path=invariants_path, num_workers=16, max_index=max_index)
 
     print("Now distinguishing the groups by the given invariants")
 
@@ -303,7 +656,7 @@ if __name__ == "__main__":
     csv_grps_idx6_path = in_groups_name + "_subgrpIdx6" + ".csv"
 
     max_index = 6
-    invariants_path = "subgrpinv_upto_" +  str(max_index) + ".csv"
+    invariants_path = get_invariants_path(max_index)
 
 
     already_computed_knots = []
@@ -312,14 +665,23 @@ if __name__ == "__main__":
         already_computed_invariants = census_csv_tools.load_knots_from_csv(invariants_path, ["knot", "invariant"])
         already_computed_knots = [row["knot"] for row in already_computed_invariants]
 
-    recompute_invariant = False
-    if recompute_invariant or not os.path.isfile(invariants_path):
-        compute_invariants_in_parallel(in_groups_csv, columns=group_columns, csv_out_path=invariants_path, num_workers=16, already_computed_knots=already_computed_knots)
+    # cheap invariant first, the full one only where needed (see distinguish_groups_tiered)
+    use_tiers = False
 
-    print("Now distinguishing the groups by the given invariants")
-    overwrite_csv = True
-    if overwrite_csv or not os.path.isfile(csv_grps_idx6_path):
-        # This time run with idx 5 groups as input.
-        distinguish_groups(in_groups_csv, group_columns, invariants_path, inv_columns, csv_grps_idx6_path)
+    recompute_invariant = False
+    if use_tiers:
+        distinguish_groups_tiered(in_groups_csv, group_columns, max_index, csv_grps_idx6_path, num_workers=16, use_batches=use_batches)
+    else:
+        if recompute_invariant or not os.path.isfile(invariants_path):
+            if use_batches:
+                compute_invariants_in_batches(get_knots_of_groups(in_groups_csv, group_columns), invariants_path, max_index, num_sessions=16)
+            else:
+                compute_invariants_in_parallel(in_groups_csv, columns=group_columns, csv_out_path=invariants_path, num_workers=16, already_computed_knots=already_computed_knots, max_index=max_index)
+
+        print("Now distinguishing the groups by the given invariants")
+        overwrite_csv = True
+        if overwrite_csv or not os.path.isfile(csv_grps_idx6_path):
+            # This time run with idx 5 groups as input.
+            distinguish_groups(in_groups_csv, group_columns, invariants_path, inv_columns, csv_grps_idx6_path)
     print("-------------- End: Deg6 Invariants--------------")
 
@@ -0,0 +1,172 @@
+"""
+@created: 2026-10-18
+
+@goal: A pool of long-lived GAP sessions for the subgroup invariants, instead of starting a new
+        GAP process (./get_inv.sh) and reading subgroup_invariant.g again for every knot.
+
+Each session loads subgroup_invariant.g once and then receives the jobs (GAP expressions) over its
+stdin. The value of a job is printed between markers, such that it can be read back while the session
+keeps running. A session which exceeds the time limit of a job, its memory limit (GAP option -K) or
+crashes is killed and restarted for the next job; the job itself raises TimeoutError / GapError.
+"""
+
+import os
+import queue
+import select
+import subprocess
+import time
+
+
+GAP_COMMAND = "gap"
+GAP_LIBRARY = "subgroup_invariant.g"
+
+RESULT_MARKER = "@@RESULT"
+END_MARKER = "@@END"
+
+
+class GapError(Exception):
+    pass
+
+
+class GapSession:
+    """ A single GAP process, use session.run(expression, timeout) to evaluate an expression.
+
+    memory_limit: e.g. "4g", GAP quits if its workspace would grow beyond that (None -> no limit).
+    """
+
+    def __init__(self, gap_command=GAP_COMMAND, library=GAP_LIBRARY, memory_limit=None):
+        self.gap_command = gap_command
+        self.library = library
+        self.memory_limit = memory_limit
+        self.process = None
+        self.num_restarts = 0
+        self.start()
+
+    def start(self):
+        command = [self.gap_command, "-q", "-b"]
+        if self.memory_limit is not None:
+            command += ["-K", self.memory_limit]
+        command += [self.library]
+
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self._buffer = b""
+
+        # an error should abort the statement (instead of entering a break loop),
+        # and the output should not be wrapped into lines of 80 characters.
+        self._write('BreakOnError := false;;\nSetPrintFormattingStatus("*stdout*", false);;\n')
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def restart(self):
+        self.stop()
+        self.num_restarts += 1
+        self.start()
+
+    def _write(self, text):
+        self.process.stdin.write(text.encode())
+        self.process.stdin.flush()
+
+    def _read_line(self, deadline):
+        while b"\n" not in self._buffer:
+            timeout = None if deadline is None else deadline - time.time()
+            if timeout is not None and timeout <= 0:
+                raise TimeoutError()
+            ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+            if len(ready) == 0:
+                raise TimeoutError()
+            data = os.read(self.process.stdout.fileno(), 1 << 16)
+            if len(data) == 0:
+                raise GapError("GAP exited with {}.".format(self.process.wait()))
+            self._buffer += data
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return line.decode()
+
+    def run(self, expression, timeout=None):
+        """ Returns the printed value of the GAP expression (as a string)."""
+        deadline = None if timeout is None else time.time() + timeout
+        try:
+            # (the end marker is a statement of its own, such that it is also printed after an error)
+            self._write('Print("\\n{}", {}, "\\n");\nPrint("\\n{}\\n");\n'.format(RESULT_MARKER, expression, END_MARKER))
+
+            lines = []
+            while True:
+                line = self._read_line(deadline)
+                if line == END_MARKER:
+                    break
+                lines.append(line)
+        except (TimeoutError, GapError, OSError) as error:
+            self.restart()
+            if isinstance(error, TimeoutError):
+                raise TimeoutError("GAP", timeout)
+            raise GapError(str(error))
+
+        output = "\n".join(lines)
+        if RESULT_MARKER not in output:
+            raise GapError(output.strip())
+        return output[output.index(RESULT_MARKER) + len(RESULT_MARKER):]
+
+    def stream(self, statement, timeout=None):
+        """ Runs the GAP statement (e.g. a function printing one line per record) and iterates over
+        the lines it prints. Here timeout is the maximal time between two lines. (As for run, the
+        session is restarted if it times out or exits.)"""
+        try:
+            self._write('{}\nPrint("\\n{}\\n");\n'.format(statement, END_MARKER))
+            while True:
+                line = self._read_line(None if timeout is None else time.time() + timeout)
+                if line == END_MARKER:
+                    return
+                yield line
+        except (TimeoutError, GapError, OSError) as error:
+            self.restart()
+            if isinstance(error, TimeoutError):
+                raise TimeoutError("GAP", timeout)
+            raise GapError(str(error))
+
+
+class GapPool:
+    """ num_sessions GAP sessions, use as
+        with GapPool(num_sessions) as pool:
+            pool.run(expression)
+    run may be called from several threads at once, each call takes a free session.
+    """
+
+    def __init__(self, num_sessions, gap_command=GAP_COMMAND, library=GAP_LIBRARY, memory_limit=None, timeout=None):
+        self.timeout = timeout
+        self.sessions = []
+        self._free = queue.Queue()
+        for _ in range(num_sessions):
+            session = GapSession(gap_command, library, memory_limit)
+            self.sessions.append(session)
+            self._free.put(session)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def run(self, expression, timeout=None):
+        """ Evaluates the expression in a free session (timeout None -> the timeout of the pool)."""
+        session = self._free.get()
+        try:
+            return session.run(expression, timeout if timeout is not None else self.timeout)
+        finally:
+            self._free.put(session)
+
+    def num_restarts(self):
+        return sum(session.num_restarts for session in self.sessions)
+
+    def close(self):
+        for session in self.sessions:
+            if session.process is not None:
+                try:
+                    session._write("quit;\n")
+                    session.process.stdin.close()
+                    session.process.wait(timeout=10)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            session.stop()
@@ -1,6 +1,6 @@
 #!/bin/sh
 
 gap -r -b -q subgroup_invariant.g << EOI
-ComputeInvariant( "$1" , "$2" , "$3" , $4);
+ComputeInvariantOfIndices( "$1" , "$2" , "$3" , ${5:-1}, $4);
 quit;
 EOI
\ No newline at end of file
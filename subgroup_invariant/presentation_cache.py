@@ -0,0 +1,137 @@
+"""
+@created: 2026-10-18
+
+@goal: Persistent cache of the (simplified) fundamental group presentations of the Dehn fillings
+        of the knots, such that the manifold, the filling and the simplification of the presentation
+        are only computed once per knot (and not again for every invariant: covers, GAP, ...).
+
+The cache is a text file with one line "knot,slope,generators,relators" per presentation, e.g.
+    K15n9379,0/1,a_b,aabAB_abbAb
+(generators and relators as given by snappy, joined by "_"). It is only appended to, either by
+the main process (see preload_presentations) or under the lock shared by the workers.
+
+Remark: This file is kept identical in enumerate_covers/ and subgroup_invariant/, both use the same
+cache file (see PRESENTATION_CACHE).
+"""
+
+import os
+import sys
+
+from pebble import ProcessPool
+
+import snappy
+
+
+# One cache for all the stages (enumerate_covers/, subgroup_invariant/, ...): presentations.csv at the
+# top level of the repository, independent of the working directory.
+PRESENTATION_CACHE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "presentations.csv"))
+
+ZERO_SURGERY = (0, 1)
+
+
+def slope_str(slope):
+    return "{}/{}".format(slope[0], slope[1])
+
+
+def compute_presentation(snappy_name, slope=ZERO_SURGERY):
+    """ Returns (generators, relators) of the fundamental group of the filling of the knot
+    (the presentation simplified by snappy)."""
+    M = snappy.Manifold(snappy_name)
+    M.dehn_fill(slope)
+    G = M.fundamental_group()
+    return (list(G.generators()), list(G.relators()))
+
+
+def load_presentations(path=PRESENTATION_CACHE, knots=None, slope=ZERO_SURGERY):
+    """ Returns the cached presentations {knot: (generators, relators)} for the given slope
+    (of the given knots only, if specified)."""
+    presentations = {}
+    if path is None or not os.path.isfile(path):
+        return presentations
+    slope = slope_str(slope)
+    with open(path) as file:
+        for line in file:
+            # (a line that was only partially written is ignored)
+            if not line.endswith("\n"):
+                continue
+            knot, knot_slope, generators, relators = line.strip().split(",")
+            if knot_slope != slope or (knots is not None and knot not in knots):
+                continue
+            presentations[knot] = (generators.split("_"), relators.split("_") if relators != "" else [])
+    return presentations
+
+
+def append_presentations(path, presentations, slope=ZERO_SURGERY, lock=None):
+    """ Appends the presentations {knot: (generators, relators)} to the cache in one write."""
+    if path is None or len(presentations) == 0:
+        return
+
+    lines = "".join("{},{},{},{}\n".format(knot, slope_str(slope), "_".join(generators), "_".join(relators))
+                    for knot, (generators, relators) in presentations.items())
+
+    if lock is not None:
+        lock.acquire()
+    try:
+        # drop a line that was only partially written
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                torn = file.read(1) != b"\n"
+            if torn:
+                with open(path, "rb") as file:
+                    data = file.read()
+                os.truncate(path, data.rfind(b"\n") + 1)
+
+        with open(path, "a") as file:
+            file.write(lines)
+            file.flush()
+            os.fsync(file.fileno())
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+def get_presentation(snappy_name, slope=ZERO_SURGERY, cached=None, path=PRESENTATION_CACHE, lock=None):
+    """ The presentation of the filling, taken from cached {knot: (generators, relators)} if it is
+    in there, else computed and appended to the cache at path."""
+    if cached is not None and snappy_name in cached:
+        return cached[snappy_name]
+    presentation = compute_presentation(snappy_name, slope)
+    append_presentations(path, {snappy_name: presentation}, slope, lock)
+    return presentation
+
+
+def preload_presentations(knots, path=PRESENTATION_CACHE, slope=ZERO_SURGERY, num_workers=16, timeout=None):
+    """ Computes (in parallel) the presentations of all the knots which are not yet in the cache,
+    and returns the presentations {knot: (generators, relators)} of all the knots.
+    """
+    knots = set(knots)
+    presentations = load_presentations(path, knots, slope)
+    missing = sorted(knots.difference(presentations))
+
+    print("Presentations: {} cached, {} to compute.".format(len(presentations), len(missing)))
+    sys.stdout.flush()
+
+    if len(missing) > 0:
+        with ProcessPool(max_workers=num_workers) as pool:
+            futures = {knot:pool.schedule(compute_presentation, args=(knot, slope), timeout=timeout) for knot in missing}
+
+            new_presentations = {}
+            for knot, future in futures.items():
+                try:
+                    new_presentations[knot] = future.result()
+                except Exception as error:
+                    print("[{}] Computing the presentation raised {}".format(knot, error))
+                    continue
+
+                # write every now and then, such that an interrupted preload is not lost
+                if len(new_presentations) >= 1000:
+                    append_presentations(path, new_presentations, slope)
+                    presentations.update(new_presentations)
+                    new_presentations = {}
+
+            append_presentations(path, new_presentations, slope)
+            presentations.update(new_presentations)
+
+    sys.stdout.flush()
+    return presentations
@@ -8,6 +8,8 @@ Goal: Try to distinguish the pairs from "subgroup_invariant/groups_of_same_volum
 
 import ast
 import csv
+import low_index
+import math
 import snappy
 from datetime import datetime
 
@@ -17,6 +19,7 @@ from pebble import ProcessPool
 import sys
 
 from census_csv_tools import *
+from presentation_cache import ZERO_SURGERY, get_presentation, preload_presentations
 
 
 ########
@@ -71,21 +74,52 @@ def accumulate_computed_invariants(csv_invariants_list, columns, delimiter=","):
 
     return accumulated_invariants
 
-def compute_covers(name, csv_inv_path, deg, debug_level=0, lock=None):
+def count_covers(presentation, max_deg):
     """
-    Uses the new snappy to compute the number of covers (upto iso) of
-    the dehn-filled knot.
+    Returns the list [n_1, ..., n_max_deg] of the number of covers of each degree up to max_deg.
+
+    The covers are counted as the transitive permutation representations of the group up to
+    conjugacy (i.e. the conjugacy classes of subgroups of index n), which low_index enumerates
+    for all the degrees up to max_deg at once, without constructing the cover manifolds
+    (as len(K.covers(deg)) does).
+    """
+    generators, relators = presentation
+    if len(generators) == 0:
+        return [1] + [0] * (max_deg - 1)
+
+    # single threaded, the parallelism is over the knots
+    reps = low_index.permutation_reps(len(generators), relators, [], max_deg, num_threads=1)
+
+    counts = [0] * max_deg
+    for rep in reps:
+        counts[len(rep[0]) - 1] += 1
+    return counts
+
+def compute_covers(name, csv_inv_path, deg, debug_level=0, lock=None, presentation=None, method="low_index"):
+    """
+    Computes the number of covers (upto iso) of the dehn-filled knot.
+
+    method:
+        "low_index" -> only counts the covers (see count_covers), also records the counts of the lower degrees.
+        "snappy"    -> len(K.covers(deg)), constructs every cover.
     """
 
     if debug_level > 0:
         print("[{}] Start computation for deg {} covers of {}(0,1)".format(name, deg, name))
         sys.stdout.flush()
 
-    K = snappy.Manifold(name)
-    K.dehn_fill((0,1))
-    n = len(K.covers(deg))
+    if method == "low_index":
+        if presentation is None:
+            presentation = get_presentation(name, ZERO_SURGERY, lock=lock)
+        counts = count_covers(presentation, deg)
+        invariant = {"num_covers_deg_{}".format(d):counts[d - 1] for d in range(2, deg + 1)}
+    else:
+        K = snappy.Manifold(name)
+        K.dehn_fill((0,1))
+        invariant = {"num_covers_deg_{}".format(deg):len(K.covers(deg))}
+    n = invariant["num_covers_deg_{}".format(deg)]
 
-    row = {"knot":name, "invariant":{"num_covers_deg_{}".format(deg):n}}
+    row = {"knot":name, "invariant":invariant}
 
     # acquire the lock
     if lock != None:
@@ -101,10 +135,36 @@ def compute_covers(name, csv_inv_path, deg, debug_level=0, lock=None):
         print("[{}] End: Num deg {} covers of {}(0,1) = {}".format(name, deg, name, n))
         sys.stdout.flush()
 
-def compute_covers_in_parallel(knots, csv_invariants_list, deg, num_workers, debug_level=0, timeout=None):
+# knots which are left out (e.g. for a test run). The knots for which the computation does not terminate 
+# in reasonable time (e.g. K15n21809) are stopped by the timeout instead, see knot_callback.
+SKIP_KNOTS = []
+
+def estimate_cover_cost(presentation, deg):
+    """ A rough estimate of the cost of the covers of degree deg (as in ../enumerate_covers/covers.py):
+    the number of tuples of permutations for the generators times the total length of the relators."""
+    generators, relators = presentation
+    return math.factorial(deg) ** max(len(generators) - 1, 1) * max(sum(len(rel) for rel in relators), 1)
+
+def knot_callback(knot):
+    """ As std_callback, but the messages name the knot (e.g. the knots stopped by the timeout)."""
+    def callback(future):
+        try:
+            result = future.result() # blocks until done.
+        except TimeoutError as error:
+            print("[{}] Ended computation after {} seconds".format(knot, error.args[1]))
+        except Exception as error:
+            print("[{}] Function raised {}".format(knot, error))
+            print(error.traceback)  # traceback of the function
+        sys.stdout.flush()
+    return callback
+
+def compute_covers_in_parallel(knots, csv_invariants_list, deg, num_workers, debug_level=0, timeout=None, skip_knots=SKIP_KNOTS, method="low_index"):
     """
     Loads the computedinvariants and checks for which knots we still need to compute 
     the invariant for the given degree.
+
+    The knots are scheduled in the order of their estimated cost, the most expensive first, such
+    that the run does not end with a few long computations on otherwise idle cores.
     """
 
     # 1) Load the already computed invariants:
@@ -112,18 +172,20 @@ def compute_covers_in_parallel(knots, csv_invariants_list, deg, num_workers, deb
     already_computed_invariants = accumulate_computed_invariants(csv_invariants_list,columns=["knot", "invariant"]) 
 
     # 2) Go through the list <knots> and check if already the invariant of the correct degree is computed.
+    to_compute = [k for k in knots if k not in skip_knots and 
+                    (k not in already_computed_invariants.keys() 
+                        or "num_covers_deg_{}".format(deg) not in already_computed_invariants[k].keys())]
+
+    presentations = preload_presentations(to_compute, num_workers=num_workers)
+    to_compute.sort(key=lambda k: -estimate_cover_cost(presentations[k], deg) if k in presentations else 0)
+
     # Create lock and the pool
     with multiprocessing.Manager() as manager:
         lock = manager.Lock()
         with ProcessPool(max_workers=num_workers) as pool:
-            for k in knots:
-                if k in ["K15n21809"]:
-                    continue
-                if (k not in already_computed_invariants.keys() 
-                        or "num_covers_deg_{}".format(deg) not in already_computed_invariants[k].keys()):
-
-                    future = pool.schedule(compute_covers, args=(k, csv_invariants_list, deg, debug_level, lock), timeout=timeout)
-                    future.add_done_callback(std_callback)
+            for k in to_compute:
+                future = pool.schedule(compute_covers, args=(k, csv_invariants_list, deg, debug_level, lock, presentations.get(k), method), timeout=timeout)
+                future.add_done_callback(knot_callback(k))
 
 
 def distinguish_groups_in_parallel(csv_group_path, group_columns, csv_out_path, method="covers"):
@@ -184,7 +246,8 @@ if __name__ == "__main__":
 
     debug_level = 2
     num_workers = 450
-    timeout=None
+    # (the knots which take longer, like K15n21809, are stopped and reported, see knot_callback)
+    timeout=36000
     deg=8
 
     total_start_time = datetime.today().now()
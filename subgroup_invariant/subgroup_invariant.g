@@ -117,6 +117,34 @@ TotalSubgroupInvariantFpGroup := function(G, max_index)
 end;
 
 
+# Tiers: The core is by far the most expensive part of the invariant. The cheap tier only contains
+# the data of the subgroup itself, the core is only computed (full tier) for the knots which are
+# not yet distinguished by the cheap tier (see distinguish_with_gap.py).
+# (The cheap invariant is [first, third] entry of the full one.)
+CheapSubgroupInvariant := function(G, H)
+    return [Index(G,H), AbelianInvariants(H)];
+end;
+
+# The subgroups of index min_index, ..., max_index only. (The iterator still has to go through the
+# smaller subgroups, but their invariants, i.e. the cores, are not computed again.) Together with the
+# invariant up to index min_index - 1 this gives the invariant up to max_index.
+TotalInvariantFpGroupOfIndices := function(G, min_index, max_index, invariant)
+    local total_invariant, subgroup;
+
+    total_invariant := [];
+    for subgroup in LowIndexSubgroupsFpGroupIterator(G, max_index) do
+        if Index(G, subgroup) >= min_index then
+            Append(total_invariant, [invariant(G,subgroup)]);
+        fi;
+    od;
+    return total_invariant;
+end;
+
+TotalSubgroupInvariantFpGroupOfIndices := function(G, min_index, max_index)
+    return TotalInvariantFpGroupOfIndices(G, min_index, max_index, SubgroupInvariant);
+end;
+
+
 if verbose then
     # The total invariant, for all subgroups:
     total_invariant := TotalSubgroupInvariantFpGroup(example_group, example_max_index);
@@ -151,4 +179,59 @@ ComputeInvariant := function(gen_str, rel_str, split_str, max_index)
     return TotalSubgroupInvariantFpGroup(group, max_index);
 end;
 
+# These return the invariant in its structured form: the sorted list [[subgroup invariant, count], ...]
+# of the distinct subgroup invariants with their multiplicities (see Collected).
+ComputeInvariantOfIndices := function(gen_str, rel_str, split_str, min_index, max_index)
+    local group;
+    group := CreateGroup(SplitString(gen_str, "_"), rel_str);
+    return Collected(TotalSubgroupInvariantFpGroupOfIndices(group, min_index, max_index));
+end;
 
+ComputeCheapInvariantOfIndices := function(gen_str, rel_str, split_str, min_index, max_index)
+    local group;
+    group := CreateGroup(SplitString(gen_str, "_"), rel_str);
+    return Collected(TotalInvariantFpGroupOfIndices(group, min_index, max_index, CheapSubgroupInvariant));
+end;
+
+
+
+#
+# 5) Batch processing: A whole file of presentations in one session.
+#
+# The file (written by distinguish_with_gap.py) has the lines
+#   name,generator_str,relator_str,min_index
+# e.g. "K15n9379,a_b,1=aabAB=abbAb,1" (the first line is the header), only the subgroups of index
+# min_index, ..., max_index are considered.
+# For each knot one record line "@@RECORD <name> <invariant>" is printed as soon as it is computed.
+#
+# Call with SetPrintFormattingStatus("*stdout*", false) such that a record is a single line.
+
+RECORD_MARKER := "@@RECORD";
+
+# tier: "full" or "cheap"
+ComputeInvariantsOfFileOfTier := function(in_path, split_str, max_index, tier)
+    local input, line, fields, compute;
+
+    if tier = "cheap" then
+        compute := ComputeCheapInvariantOfIndices;
+    else
+        compute := ComputeInvariantOfIndices;
+    fi;
+
+    input := InputTextFile(in_path);
+    line := ReadLine(input);
+    while line <> fail do
+        line := Chomp(line);
+        fields := SplitString(line, ",");
+        if Length(fields) = 4 and fields[1] <> "name" then
+            Print(RECORD_MARKER, " ", fields[1], " ", 
+                  compute(fields[2], fields[3], split_str, Int(fields[4]), max_index), "\n");
+        fi;
+        line := ReadLine(input);
+    od;
+    CloseStream(input);
+end;
+
+ComputeInvariantsOfFile := function(in_path, split_str, max_index)
+    ComputeInvariantsOfFileOfTier(in_path, split_str, max_index, "full");
+end;